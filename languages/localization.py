@@ -4,14 +4,24 @@ import gettext
 # list of supported languages
 languages = {'de': 'Deutsch', 'en': 'English'}
 
+# loaded translation catalogs: (.mo file) -> (modification time, translation function)
+_translations = {}
+
 
 # method to get the language name by its code
 def get_language(code):
     return languages[code]
 
 
-# method to get the translation function
+# method to get the translation function (each catalog is parsed once and again only when its .mo file changed)
 def get_translation(page, code):
     path = os.getcwd() + '/languages'
-    lang = gettext.translation(page, localedir=path, languages=[code])
-    return lang.gettext
+    mo_file = os.path.join(path, code, 'LC_MESSAGES', page + '.mo')
+    mtime = os.path.getmtime(mo_file)
+    cached = _translations.get(mo_file)
+    if cached is None or cached[0] != mtime:
+        with open(mo_file, 'rb') as catalog:
+            lang = gettext.GNUTranslations(catalog)
+        cached = (mtime, lang.gettext)
+        _translations[mo_file] = cached
+    return cached[1]
@@ -1,16 +1,15 @@
 # 3rd party modules
 import streamlit as st
-from PIL import Image
 
 # custom modules
 from languages import localization
-from tools import footer
+from tools import footer, assets
 from pages import settings, configurator, simulator, report, setup
 import menu
 
 # webpage configuration
 title = 'Prototype'
-logo = Image.open('resources/images/favicon.jpg')
+logo = assets.get_bytes('resources/images/favicon.jpg')
 st.set_page_config(page_title=title, page_icon=logo, layout='wide', initial_sidebar_state='auto')
 
 # default language
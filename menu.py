@@ -1,10 +1,9 @@
 # 3rd party modules
 import streamlit as st
-from PIL import Image
 
 # custom modules
 from languages import localization
-from tools import loader
+from tools import loader, assets
 
 # pages
 pages = ['Settings', 'Configurator', 'Simulator', 'Report']
@@ -40,7 +39,7 @@ def show():
 
     # logo
     with col0:
-        st.image('resources/images/logo.png', width=120)
+        st.image(assets.get_bytes('resources/images/logo.png'), width=120)
 
     # customer info
     with col2:
@@ -66,7 +65,7 @@ def show():
 
     # sales manager
     with col8:
-        st.image('resources/images/person.png')
+        st.image(assets.get_bytes('resources/images/person.png'))
     with col9:
         st.markdown(f'''Area Sales Manager  
                     **Peter Muster**''')
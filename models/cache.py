@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+# default memory budget of the process-wide result cache
+MAX_BYTES = 256 * 1024**2
+
+# directory and size budget of the persistent result cache (shared by all workers of a deployment)
+DISK_DIR = os.environ.get('SIMULATION_CACHE_DIR', os.path.join('tmp', 'cache'))
+DISK_MAX_BYTES = int(os.environ.get('SIMULATION_CACHE_MAX_BYTES', 2 * 1024**3))
+
+# version of the simulation results, part of every key: increase it whenever a change of the simulation (sampling,
+# block size, dtypes) or of the result layout makes stored results invalid, so old entries are never served again
+VERSION = 2
+
+
+def make_key(kind, params):
+    """
+    Returns a content hash of a parameter snapshot and the result version, used as cache key.
+    """
+    def normalize(value):
+        return value.item() if isinstance(value, np.generic) else value
+
+    snapshot = {name: normalize(value) for name, value in params.items()}
+    payload = json.dumps([VERSION, kind, snapshot], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _arrays(results):
+    """
+    Yields all arrays of a (nested) results dictionary.
+    """
+    for value in results.values():
+        if isinstance(value, dict):
+            yield from _arrays(value)
+        elif isinstance(value, np.ndarray):
+            yield value
+
+
+def _flatten(results, prefix=''):
+    """
+    Yields (path, value) pairs of a (nested) results dictionary, with the keys joined by dots.
+    """
+    for name, value in results.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, prefix + name + '.')
+        else:
+            yield prefix + name, value
+
+
+def _unflatten(items):
+    """
+    Rebuilds a nested results dictionary from (path, value) pairs.
+    """
+    results = {}
+    for path, value in items:
+        *parents, name = path.split('.')
+        node = results
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[name] = value
+    return results
+
+
+class Disk_Cache():
+    """
+    Persistent cache of simulation results. Every entry is a directory named by the key, holding one .npy file
+    per array and the scalar values in meta.json. Arrays are reloaded memory-mapped and read-only.
+    """
+    def __init__(self, directory=DISK_DIR, max_bytes=DISK_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, 'meta.json')) as meta_file:
+                meta = json.load(meta_file)
+            items = [(name, np.load(os.path.join(path, name + '.npy'), mmap_mode='r')) for name in meta['arrays']]
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            # mark the entry as recently used (not permitted for entries of other users)
+            os.utime(path)
+        except OSError:
+            pass
+        return _unflatten(items + list(meta['values'].items()))
+
+    def put(self, key, results):
+        path = self._path(key)
+        if os.path.isdir(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        # write into a temporary directory first, so other workers never see incomplete entries; unlike mkdtemp
+        # (owner only) its permissions follow the umask, so workers running as other users can read the entry
+        staging = os.path.join(self.directory, '.' + key + uuid.uuid4().hex)
+        os.mkdir(staging, 0o777)
+        meta = {'arrays': [], 'values': {}}
+        for name, value in _flatten(results):
+            if isinstance(value, np.ndarray):
+                np.save(os.path.join(staging, name + '.npy'), value)
+                meta['arrays'].append(name)
+            else:
+                meta['values'][name] = value
+        with open(os.path.join(staging, 'meta.json'), 'w') as meta_file:
+            json.dump(meta, meta_file)
+        try:
+            os.rename(staging, path)
+        except OSError:
+            # another worker stored the same entry in the meantime
+            shutil.rmtree(staging, ignore_errors=True)
+        self._evict()
+
+    def _evict(self):
+        # remove the least recently used entries until the directory fits into the size budget
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Result_Cache():
+    """
+    Process-wide LRU cache of simulation results, bounded by the number of bytes of the stored arrays.
+    Misses fall back to an optional persistent cache, which also receives every stored entry.
+    """
+    def __init__(self, max_bytes=MAX_BYTES, disk=None):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+
+        # reload from the persistent cache
+        results = self.disk.get(key) if self.disk is not None else None
+        with self._lock:
+            if results is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._store(key, results)
+        return results
+
+    def put(self, key, results):
+        self._store(key, results)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, results)
+            except OSError:
+                # the persistent cache is an optimization only
+                pass
+
+    def _store(self, key, results):
+        # cached results are shared between sessions, so protect them against manipulation from outside
+        size = 0
+        for array in _arrays(results):
+            array.flags.writeable = False
+            size += array.nbytes
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (results, size)
+            self._bytes += size
+            # evict the least recently used entries
+            while self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses}
+
+
+# process-wide cache shared by all sessions, backed by the persistent cache
+results_cache = Result_Cache(disk=Disk_Cache())
@@ -0,0 +1,79 @@
+from functools import lru_cache
+
+import numpy as np
+
+# maintenance is charged starting with this month (0-based), i.e. after the warranty period of 24 months
+MAINTENANCE_START = 24
+
+
+def compute_rates(n_months, costs, upfront, interest_rate, amortization, maintenance,
+                  maintenance_start=MAINTENANCE_START):
+    """
+    Returns the monthly rates of the classic loan for the costs remaining after the upfront payment. Each month
+    with an outstanding balance pays the interest on the balance, the amortization and (after the start month)
+    the maintenance. All parameters except n_months broadcast, so several upfront payments and interest rates
+    are evaluated in one call; the months are the last axis.
+    """
+    costs = np.asarray(costs, dtype=np.float64)[..., None]
+    upfront = np.asarray(upfront, dtype=np.float64)[..., None]
+    interest_rate = np.asarray(interest_rate, dtype=np.float64)[..., None]
+    amortization = np.asarray(amortization, dtype=np.float64)[..., None]
+    maintenance = np.asarray(maintenance, dtype=np.float64)[..., None]
+    months = np.arange(n_months)
+
+    # outstanding balance at the beginning of each month
+    balance = (costs - upfront) - months * amortization
+
+    rates = balance * interest_rate + amortization + (months >= maintenance_start) * maintenance
+    return np.where(balance > 0, rates, 0.0)
+
+
+def compute_costs(n_months, costs, upfront, interest_rate, amortization, maintenance,
+                  maintenance_start=MAINTENANCE_START):
+    """
+    Returns the cumulative costs (including the upfront payment) of the classic loan per month.
+    """
+    rates = compute_rates(n_months, costs, upfront, interest_rate, amortization, maintenance, maintenance_start)
+    return np.asarray(upfront, dtype=np.float64)[..., None] + np.cumsum(rates, axis=-1)
+
+
+@lru_cache(maxsize=1024)
+def classic_costs(n_months, costs, upfront, interest_rate, amortization, maintenance):
+    """
+    Memoized cumulative costs of a single classic loan, keyed by the scalar inputs. The returned array is shared
+    between callers and therefore read-only.
+    """
+    result = compute_costs(n_months, costs, upfront, interest_rate, amortization, maintenance)
+    result.flags.writeable = False
+    return result
+
+
+def test():
+    # compare with the month by month schedule
+    n_months, costs, upfront, interest_rate, amortization, maintenance = 60, 50000, 5000, 0.03, 1000, 100
+    balance = costs - upfront
+    total = upfront
+    expected = []
+    for i in range(n_months):
+        if balance > 0:
+            total += balance * interest_rate + amortization + (maintenance if i >= MAINTENANCE_START else 0)
+            balance -= amortization
+        expected.append(total)
+    assert np.allclose(classic_costs(n_months, costs, upfront, interest_rate, amortization, maintenance), expected)
+
+    # sweep over upfront payments and interest rates
+    sweep = compute_costs(n_months, costs, np.arange(0, 50001, 10000)[:, None], [0.01, 0.03], amortization,
+                          maintenance)
+    assert sweep.shape == (6, 2, n_months)
+    assert np.allclose(sweep[0, 1], compute_costs(n_months, costs, 0, 0.03, amortization, maintenance))
+
+    # the machine costs, amortization and maintenance broadcast as well
+    sweep = compute_costs(n_months, [costs, 2 * costs], upfront, interest_rate, [amortization, 2 * amortization],
+                          [maintenance, 0])
+    assert sweep.shape == (2, n_months)
+    assert np.allclose(sweep[0], expected)
+    assert np.allclose(sweep[1], compute_costs(n_months, 2 * costs, upfront, interest_rate, 2 * amortization, 0))
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from models import streams
+
+# process-wide worker pool, created on first use; the lock guards its creation and replacement as well as the
+# submission of tasks, since every session runs in its own thread
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+# workers are started fresh instead of forked, since forking the multi-threaded server may inherit held locks
+START_METHOD = 'spawn'
+
+
+def get_pool(max_workers=None):
+    """
+    Returns the process-wide pool of simulation workers. A pool that broke (e.g. a worker was killed) is replaced.
+    """
+    with _pool_lock:
+        return _get_pool(max_workers)
+
+
+def _get_pool(max_workers):
+    # called with the pool lock held
+    global _pool, _pool_workers
+    max_workers = max_workers or os.cpu_count() or 1
+    if _pool is not None and getattr(_pool, '_broken', False):
+        _discard_pool(_pool)
+    if _pool is None or _pool_workers != max_workers:
+        # the tasks already submitted to the old pool still complete, without holding the lock meanwhile
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(START_METHOD))
+        _pool_workers = max_workers
+    return _pool
+
+
+def _discard_pool(pool):
+    # drop the broken pool without waiting for its (possibly dead) workers, the next call of get_pool() creates a new
+    # one; a pool another thread already replaced is left alone
+    global _pool, _pool_workers
+    if pool is _pool:
+        _pool = None
+        _pool_workers = None
+    pool.shutdown(wait=False)
+
+
+def _simulate_blocks(model_class, params, child_seeds, block_sizes, shm_name, shape, first_row):
+    """
+    Worker task: draws the given blocks of runs and writes them into the shared OEE matrix.
+    Returns the number of rows written (adaptive models may stop before drawing all blocks).
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        model = model_class(**params)
+        if model.adaptive:
+            runs = model._generate_adaptive(child_seeds, block_sizes)
+        else:
+            runs = model._generate_runs(child_seeds, block_sizes)
+        OEE = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        OEE[first_row:first_row + runs.shape[0]] = runs
+        return runs.shape[0]
+    finally:
+        shm.close()
+
+
+def recompute(models, max_workers=None):
+    """
+    Recomputes all production models whose parameters changed, distributing their blocks of runs over the
+    process pool. Workers write into shared memory, so only parameters and seeds are pickled. Models are marked
+    clean only once their results are stored, so after a failure they are recomputed on the next call.
+    """
+    pending = []
+    for model in models:
+        if model._dirty:
+            model._snapshot_parameters()
+            if not model._load_cached():
+                pending.append(model)
+    if not pending:
+        return
+
+    jobs = []
+    pool = None
+    try:
+        # dispatch every model's blocks, split into one chunk per worker (adaptive models stop sequentially,
+        # so they are simulated as a single chunk); the pool can't be replaced while the tasks are submitted
+        with _pool_lock:
+            pool = _get_pool(max_workers)
+            n_workers = _pool_workers
+            for model in pending:
+                block_sizes, root_seed, child_seeds = model._plan_runs()
+                shape = (sum(block_sizes), model.duration)
+                shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+                # registered before submitting, so the segment is released even if the submission fails
+                futures = []
+                jobs.append((model, root_seed, shm, shape, futures))
+                first_row = 0
+                for chunk in streams.shard(list(range(len(block_sizes))), 1 if model.adaptive else n_workers):
+                    chunk_sizes = [block_sizes[i] for i in chunk]
+                    futures.append(pool.submit(_simulate_blocks, type(model), model._params_dic,
+                                               [child_seeds[i] for i in chunk], chunk_sizes,
+                                               shm.name, shape, first_row))
+                    first_row += sum(chunk_sizes)
+
+        # collect the results in the parent process
+        for model, root_seed, shm, shape, futures in jobs:
+            n_rows = sum(future.result() for future in futures)
+            OEE = np.array(np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[:n_rows])
+            model._store_results(OEE, root_seed.entropy)
+    except BrokenProcessPool:
+        if pool is not None:
+            with _pool_lock:
+                _discard_pool(pool)
+        raise
+    finally:
+        for model, root_seed, shm, shape, futures in jobs:
+            for future in futures:
+                future.cancel()
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,42 @@
+import numpy as np
+
+
+def _unchanged(old, new):
+    # arrays are compared by identity, everything else by type and value
+    if isinstance(old, np.ndarray) or isinstance(new, np.ndarray):
+        return old is new
+    return type(old) is type(new) and old == new
+
+
+class Parameter():
+    """
+    Model parameter: assigning a new value marks the model as dirty, so its results are recomputed on the next
+    call of get_results(). An optional conversion normalizes the assigned values (e.g. None to a default).
+    """
+    def __init__(self, convert=None):
+        self.convert = convert
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.attr = '_' + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.__dict__[self.attr]
+
+    def __set__(self, instance, value):
+        if self.convert is not None:
+            value = self.convert(value)
+        if self.attr in instance.__dict__ and _unchanged(instance.__dict__[self.attr], value):
+            return
+        instance.__dict__[self.attr] = value
+        instance._dirty = True
+
+
+def snapshot(model):
+    """
+    Returns a dictionary with the current values of all parameters of the model.
+    """
+    return {name: getattr(model, name)
+            for name, attr in vars(type(model)).items() if isinstance(attr, Parameter)}
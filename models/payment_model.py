@@ -1,7 +1,93 @@
 import pandas as pd
 import numpy as np
 
+from models import parameter, results
+
+
+def compute_rates(number_of_units, production_time, payment_per_month, payment_per_production_unit,
+                  payment_per_production_time, service_costs, payment_floor_per_month, payment_cap_per_month,
+                  min_contract_term, max_contract_term):
+    """
+    Returns the monthly rates for the given (n_runs, n_months) units and production time. All parameters broadcast,
+    so a single call evaluates all runs (and several payment models if the parameters are given as arrays).
+    """
+    number_of_units = np.atleast_2d(number_of_units)
+    n_months = number_of_units.shape[-1]
+    months = np.arange(1, n_months + 1)
+
+    # fixed and usage dependent fees
+    rates = payment_per_month + service_costs + payment_per_production_unit * number_of_units
+    rates = rates + payment_per_production_time * production_time
+
+    # floor and cap per month (a cap of 0 means no cap)
+    rates = np.maximum(rates, payment_floor_per_month)
+    rates = np.where(payment_cap_per_month > 0, np.minimum(rates, payment_cap_per_month), rates)
+
+    # months after the maximum contract term are not billed (a term of 0 means no limit)
+    rates = np.where((max_contract_term <= 0) | (months <= max_contract_term), rates, 0)
+
+    # months missing to the minimum contract term are billed with the fixed fee at the end of the horizon
+    fixed_fee = np.maximum(payment_per_month + service_costs, payment_floor_per_month)
+    fixed_fee = np.where(payment_cap_per_month > 0, np.minimum(fixed_fee, payment_cap_per_month), fixed_fee)
+    missing_months = np.maximum(min_contract_term - n_months, 0)
+    rates = rates + (months == n_months) * missing_months * fixed_fee
+
+    return rates
+
+
+def evaluate(payment_models, number_of_units, production_time=0, include_upfront=True):
+    """
+    Evaluates several payment models for the same (n_runs, n_months) units in one vectorized pass.
+    Returns the rates and cumulative costs as (n_models, n_runs, n_months) arrays together with their per-month
+    summary statistics over the runs, e.g. the percentile bands of the cumulative costs.
+    The upfront payment only shifts the cumulative costs; without it the results can be reused for any upfront.
+    """
+    def stacked(name):
+        return np.array([getattr(model, name) for model in payment_models], dtype=np.float64).reshape(-1, 1, 1)
+
+    rates = compute_rates(number_of_units, production_time,
+                          stacked('payment_per_month'), stacked('payment_per_production_unit'),
+                          stacked('payment_per_production_time'), stacked('service_costs'),
+                          stacked('payment_floor_per_month'), stacked('payment_cap_per_month'),
+                          stacked('min_contract_term'), stacked('max_contract_term'))
+    costs = np.cumsum(rates, axis=-1)
+    if include_upfront:
+        costs += stacked('payment_upfront')
+
+    return {
+        'rates': rates,
+        'costs': costs,
+        'summary': {
+            'rates': results.summarize(rates, axis=1),
+            'costs': results.summarize(costs, axis=1),
+        },
+    }
+
+
 class Payment_Model():
+    # model parameters; assigning a new value marks the results as outdated
+    id = parameter.Parameter()
+    name = parameter.Parameter()
+    payment_unit = parameter.Parameter()
+    production_unit = parameter.Parameter()
+    time_unit = parameter.Parameter()
+    number_of_units = parameter.Parameter()
+    production_time = parameter.Parameter()
+    payment_upfront = parameter.Parameter()
+    payment_per_production_time = parameter.Parameter()
+    payment_per_production_unit = parameter.Parameter()
+    payment_per_month = parameter.Parameter()
+    payment_floor_per_month = parameter.Parameter()
+    payment_cap_per_month = parameter.Parameter()
+    min_contract_term = parameter.Parameter()
+    # a maximum contract term of None means no limit, stored as 0 so all evaluations see the same value
+    max_contract_term = parameter.Parameter(convert=lambda term: 0 if term is None else term)
+    final_maturity = parameter.Parameter()
+    description = parameter.Parameter()
+    compatible_machines = parameter.Parameter()
+    compatible_options = parameter.Parameter()
+    service_costs = parameter.Parameter()
+
     def __init__(self, 
                  id = 1,
                  name = 'new_model',
@@ -9,6 +95,7 @@ class Payment_Model():
                  production_unit = 'kilogram',
                  time_unit = 'hours',
                  number_of_units = 0,
+                 production_time = 0,
                  payment_upfront = 0,
                  payment_per_production_time = 0,
                  payment_per_production_unit = 0,
@@ -16,7 +103,7 @@ class Payment_Model():
                  payment_floor_per_month = 0,
                  payment_cap_per_month = 0,
                  min_contract_term = 12,
-                 max_contract_term = 12,
+                 max_contract_term = 0,
                  final_maturity = 'static',
                  description = 0,
                  compatible_machines = 0,
@@ -30,6 +117,7 @@ class Payment_Model():
         self.production_unit = production_unit
         self.time_unit = time_unit
         self.number_of_units = number_of_units
+        self.production_time = production_time
         self.payment_upfront = payment_upfront
         self.payment_per_production_time = payment_per_production_time
         self.payment_per_production_unit = payment_per_production_unit
@@ -43,55 +131,34 @@ class Payment_Model():
         self.compatible_machines = compatible_machines
         self.compatible_options = compatible_options
         self.service_costs = service_costs
-        self._recompute()
+
+        # the results are computed lazily on the first call of get_results()
+        self._results = None
+        self._dirty = True
 
     def _recompute(self):
         # save a snapshot of the current parameter values
-        self._params_dic = {'id' : self.id,
-                            'name' : self.name,
-                            'payment_unit' : self.payment_unit,
-                            'production_unit' : self.production_unit,
-                            'time_unit' : self.time_unit,
-                            'payment_upfront' : self.payment_upfront,
-                            'payment_per_production_time' : self.payment_per_production_time,
-                            'payment_per_production_unit' : self.payment_per_production_unit,
-                            'payment_per_month' : self.payment_per_month,
-                            'payment_floor_per_month' : self.payment_floor_per_month,
-                            'payment_cap_per_month' : self.payment_cap_per_month,
-                            'min_contract_term' : self.min_contract_term,
-                            'max_contract_term' : self.max_contract_term,
-                            'final_maturity' : self.final_maturity,
-                            'description' : self.description,
-                            'compatible_machines' : self.compatible_machines,
-                            'compatible_options' : self.compatible_options,
-                            'service_costs' : self.service_costs
-                            }
-        # compute the results for the current parameter values
-        #TODO#
-        self._results = self.payment_per_month + self.payment_per_production_unit * self.number_of_units + self.service_costs
-
-    def _parameters_changed(self):
-        return (self._params_dic['id'] != self.id) | \
-               (self._params_dic['name'] != self.name) | \
-               (self._params_dic['payment_unit'] != self.payment_unit) | \
-               (self._params_dic['production_unit'] != self.production_unit) | \
-               (self._params_dic['time_unit'] != self.time_unit) | \
-               (self._params_dic['payment_upfront'] != self.payment_upfront) | \
-               (self._params_dic['payment_per_production_time'] != self.payment_per_production_time) | \
-               (self._params_dic['payment_per_production_unit'] != self.payment_per_production_unit) | \
-               (self._params_dic['payment_per_month'] != self.payment_per_month) | \
-               (self._params_dic['payment_floor_per_month'] != self.payment_floor_per_month) | \
-               (self._params_dic['payment_cap_per_month'] != self.payment_cap_per_month) | \
-               (self._params_dic['min_contract_term'] != self.min_contract_term) | \
-               (self._params_dic['max_contract_term'] != self.max_contract_term) | \
-               (self._params_dic['final_maturity'] != self.final_maturity) | \
-               (self._params_dic['description'] != self.description) | \
-               (self._params_dic['compatible_machines'] != self.compatible_machines) | \
-               (self._params_dic['compatible_options'] != self.compatible_options) | \
-               (self._params_dic['service_costs'] != self.service_costs)
+        self._params_dic = parameter.snapshot(self)
+        # compute the monthly rates and cumulative costs of all runs at once
+        rates = compute_rates(self.number_of_units, self.production_time,
+                              self.payment_per_month, self.payment_per_production_unit,
+                              self.payment_per_production_time, self.service_costs,
+                              self.payment_floor_per_month, self.payment_cap_per_month,
+                              self.min_contract_term, self.max_contract_term)
+        costs = self.payment_upfront + np.cumsum(rates, axis=-1)
+
+        self._results = {
+            'rates': rates,
+            'costs': costs,
+            'summary': {
+                'rates': results.summarize(rates),
+                'costs': results.summarize(costs),
+            },
+        }
+        self._dirty = False
 
     def get_results(self):
-        if self._parameters_changed():
+        if self._dirty:
             self._recompute()
         return self._results  # .copy() to protect against data manipulation from outside.
             
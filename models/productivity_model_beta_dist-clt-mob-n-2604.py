@@ -1,5 +1,7 @@
 import numpy as np
 
+from models import streams
+
 
 class Productivity_Model_Beta_Dist():
     def __init__(self,
@@ -12,7 +14,8 @@ class Productivity_Model_Beta_Dist():
                  duration = 36,
                  max_units_per_hour = 1,
                  hours_per_day = 16,
-                 days_per_month = 25
+                 days_per_month = 25,
+                 seed = None
                 ):
 
         self.PF_mean = PF_mean
@@ -25,6 +28,7 @@ class Productivity_Model_Beta_Dist():
         self.max_units_per_hour = max_units_per_hour
         self.hours_per_day = hours_per_day
         self.days_per_month = days_per_month
+        self.seed = seed
         self._recompute()
     
     def _calc_alpha_beta(self, mean, std):
@@ -36,12 +40,12 @@ class Productivity_Model_Beta_Dist():
         beta = alpha*(1-mean) / mean
         return alpha, beta
 
-    def _generate_timeseries(self, mean, std, duration):
+    def _generate_timeseries(self, mean, std, duration, rng):
         '''
         Returns an array with beta distributed values given the mean and standard deviation.
         '''
         alpha, beta = self._calc_alpha_beta(mean, std)
-        return np.random.beta(alpha, beta, size=duration)
+        return rng.beta(alpha, beta, size=duration)
 
     def _calc_number_of_units(self, OEE, max_units_per_hour, hours_per_day, days_per_month):
 
@@ -58,13 +62,16 @@ class Productivity_Model_Beta_Dist():
                             'duration' : self.duration,
                             'max_units_per_hour' : self.max_units_per_hour,
                             'hours_per_day' : self.hours_per_day,
-                            'days_per_month' : self.days_per_month
+                            'days_per_month' : self.days_per_month,
+                            'seed' : self.seed
                             }
 
-        # make beta distributed array
-        PF = self._generate_timeseries(self.PF_mean, self.PF_std, self.duration)
-        AF = self._generate_timeseries(self.AF_mean, self.AF_std, self.duration)
-        QF = self._generate_timeseries(self.QF_mean, self.QF_std, self.duration)
+        # make beta distributed array, each factor drawn from its own child stream
+        root_seed, child_seeds = streams.spawn_seeds(self.seed, 3)
+        PF_rng, AF_rng, QF_rng = [np.random.default_rng(child_seed) for child_seed in child_seeds]
+        PF = self._generate_timeseries(self.PF_mean, self.PF_std, self.duration, PF_rng)
+        AF = self._generate_timeseries(self.AF_mean, self.AF_std, self.duration, AF_rng)
+        QF = self._generate_timeseries(self.QF_mean, self.QF_std, self.duration, QF_rng)
         OEE = PF * AF * QF
         number_of_units = self._calc_number_of_units(OEE, self.max_units_per_hour, self.hours_per_day, self.days_per_month)
     
@@ -74,6 +81,7 @@ class Productivity_Model_Beta_Dist():
             'quality': QF,
             'OEE': OEE,
             'number_of_units': number_of_units,
+            'seed': root_seed.entropy,
             }
 
     def _parameters_changed(self):
@@ -86,7 +94,8 @@ class Productivity_Model_Beta_Dist():
                (self._params_dic['duration'] != self.duration) | \
                (self._params_dic['max_units_per_hour'] != self.max_units_per_hour) | \
                (self._params_dic['hours_per_day'] != self.hours_per_day) | \
-               (self._params_dic['days_per_month'] != self.days_per_month)
+               (self._params_dic['days_per_month'] != self.days_per_month) | \
+               (self._params_dic['seed'] != self.seed)
 
     def get_results(self):
         if self._parameters_changed():
@@ -1,7 +1,42 @@
+import time
+
 import numpy as np
 
+from models import cache, parameter, results, sampling, streams
+
+# default number of Monte Carlo runs per simulation (hard cap in adaptive mode)
+N_RUNS = 10000
+
+# default relative standard error at which adaptive simulations stop
+TOLERANCE = 0.005
+
+# default sampling method of the beta distributed utilization (see sampling.METHODS)
+SAMPLING = 'random'
+
+# with variance reduction the blocks are the independent replicates the standard error is estimated from,
+# so adaptive simulations use more but smaller blocks and stop much earlier
+VARIANCE_REDUCTION_BLOCK_SIZE = 32
+VARIANCE_REDUCTION_MIN_BLOCKS = 8
+
 
 class Productivity_Model_Beta_Dist():
+    # model parameters; assigning a new value marks the results as outdated
+    target_util_mean = parameter.Parameter()
+    target_util_std = parameter.Parameter()
+    target_util_rampup_mean = parameter.Parameter()
+    target_util_rampup_std = parameter.Parameter()
+    rampup_time = parameter.Parameter()
+    duration = parameter.Parameter()
+    max_units_per_hour = parameter.Parameter()
+    hours_per_day = parameter.Parameter()
+    days_per_month = parameter.Parameter()
+    compact = parameter.Parameter()
+    seed = parameter.Parameter()
+    n_runs = parameter.Parameter()
+    adaptive = parameter.Parameter()
+    tolerance = parameter.Parameter()
+    sampling = parameter.Parameter()
+
     def __init__(self,
                  target_util_mean=1,
                  target_util_std=0.1,
@@ -11,7 +46,13 @@ class Productivity_Model_Beta_Dist():
                  duration=36,
                  max_units_per_hour=1,
                  hours_per_day=16,
-                 days_per_month=25
+                 days_per_month=25,
+                 compact=False,
+                 seed=None,
+                 n_runs=N_RUNS,
+                 adaptive=False,
+                 tolerance=TOLERANCE,
+                 sampling=SAMPLING
                  ):
 
         self.target_util_mean = target_util_mean
@@ -23,7 +64,16 @@ class Productivity_Model_Beta_Dist():
         self.max_units_per_hour = max_units_per_hour
         self.hours_per_day = hours_per_day
         self.days_per_month = days_per_month
-        self._recompute()
+        self.compact = compact
+        self.seed = seed
+        self.n_runs = n_runs
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.sampling = sampling
+
+        # the simulation runs lazily on the first call of get_results()
+        self._results = None
+        self._dirty = True
 
     def _calc_alpha_beta(self, mean, std):
         """
@@ -34,81 +84,186 @@ class Productivity_Model_Beta_Dist():
         beta = alpha*(1-mean) / mean
         return alpha, beta
 
-    def _generate_timeseries(self, mean, std, mean_rampup, std_rampup, rampup_time, duration, n_runs=10000):
+    def _generate_timeseries(self, mean, std, mean_rampup, std_rampup, rampup_time, duration, n_runs=N_RUNS, rng=None,
+                             method=SAMPLING):
         """
-        Returns an array with beta distributed values given the mean and standard deviation.
+        Returns a (n_runs, duration) array with beta distributed values given the mean and standard deviation.
+        Except for plain random sampling, the values are the inverse beta CDF of (n_runs, duration) uniform values
+        of the sampling method, i.e. every month is one dimension of the sample.
         """
-        timeseries_n_runs = []
-        for i in range(n_runs):
-            # Caluclation during RampUp
-            # Calculate Linear function for rampup
-            def rampup_gradient(x): return (mean-mean_rampup) / rampup_time * x + mean_rampup
-            timeseries_rampup_gradient = rampup_gradient(np.arange(1, rampup_time+1))
+        rng = np.random.default_rng() if rng is None else rng
+        timeseries = np.empty((n_runs, duration))
+        n_rampup = min(rampup_time, duration)
+        u = None if method == 'random' else sampling.uniforms(method, n_runs, duration, rng)
+
+        # Calculation during RampUp
+        if n_rampup > 0:
+            # Linear function for rampup, evaluated once for all runs
+            rampup_gradient = (mean-mean_rampup) / rampup_time * np.arange(1, n_rampup+1) + mean_rampup
             # Alpha and beta calculation exceptions-> only the mean is used without std
             if mean_rampup == 1 or mean_rampup+std_rampup >= 1 or mean_rampup == 0 or mean_rampup-std_rampup <= 0:
-                pass
+                timeseries[:, :n_rampup] = rampup_gradient
             else:
-                for i in range(rampup_time):
-                    alpha_rampup, beta_rampup = self._calc_alpha_beta(timeseries_rampup_gradient[i], std_rampup)
-                    timeseries_rampup_gradient[i] = np.random.beta(alpha_rampup, beta_rampup)
-            # Calculations after RampUp
+                # one alpha/beta pair per rampup month, broadcast over all runs
+                alpha_rampup, beta_rampup = self._calc_alpha_beta(rampup_gradient, std_rampup)
+                timeseries[:, :n_rampup] = sampling.beta(alpha_rampup, beta_rampup, (n_runs, n_rampup), rng,
+                                                         None if u is None else u[:, :n_rampup])
+
+        # Calculations after RampUp
+        if duration > n_rampup:
             # Alpha and beta calculation exceptions
             if mean == 1 or mean == 0 or std == 0 or mean+std > 1 or mean - std <= 0:
-                timeseries = np.repeat(mean_rampup, rampup_time)
+                timeseries[:, n_rampup:] = mean
             else:
                 alpha, beta = self._calc_alpha_beta(mean, std)
-                timeseries = np.random.beta(alpha, beta, size=duration - rampup_time)
+                timeseries[:, n_rampup:] = sampling.beta(alpha, beta, (n_runs, duration - n_rampup), rng,
+                                                         None if u is None else u[:, n_rampup:])
 
-            timeseries = np.append(timeseries_rampup_gradient, timeseries)
-            timeseries_n_runs.append(timeseries)
-        return timeseries_n_runs
+        return timeseries
 
     def _calc_number_of_units(self, OEE, max_units_per_hour, hours_per_day, days_per_month):
 
-        return [np.floor(i * max_units_per_hour * hours_per_day * days_per_month) for i in OEE]
+        return np.floor(OEE * max_units_per_hour * hours_per_day * days_per_month)
+
+    def _generate_runs(self, child_seeds, block_sizes):
+        """
+        Returns the OEE matrix of the given blocks of runs, each block drawn from its own child stream.
+        """
+        return np.vstack([self._generate_timeseries(self.target_util_mean,
+                                                    self.target_util_std,
+                                                    self.target_util_rampup_mean,
+                                                    self.target_util_rampup_std,
+                                                    self.rampup_time,
+                                                    self.duration,
+                                                    n_runs=size,
+                                                    rng=np.random.default_rng(child_seed),
+                                                    method=self.sampling)
+                          for child_seed, size in zip(child_seeds, block_sizes)])
+
+    def _generate_adaptive(self, child_seeds, block_sizes):
+        """
+        Draws blocks of runs until the relative standard errors of the monthly mean and of the cumulative number
+        of units fall below the tolerance. For any payment model the relative standard error of the final
+        cumulative cost is bounded by the one of the cumulative units. Returns the OEE matrix of the drawn runs.
+        The runs of a block are not independent with variance reduction, but the blocks are (each one is an
+        independently randomized sample), so the standard errors are estimated from the spread of the block means.
+        """
+        blocks = []
+        n = 0
+        sum_monthly, sumsq_monthly = 0, 0
+        sum_total, sumsq_total = 0, 0
+        block_monthly, block_total = [], []
+        for child_seed, size in zip(child_seeds, block_sizes):
+            block = self._generate_runs([child_seed], [size])
+            blocks.append(block)
+
+            # update the running moments of the units per month and of the cumulative units
+            units = self._calc_number_of_units(block, self.max_units_per_hour, self.hours_per_day, self.days_per_month)
+            total = units.sum(axis=1)
+            n += size
+            sum_monthly = sum_monthly + units.sum(axis=0)
+            sumsq_monthly = sumsq_monthly + (units**2).sum(axis=0)
+            sum_total += total.sum()
+            sumsq_total += (total**2).sum()
+            block_monthly.append(units.mean(axis=0))
+            block_total.append(total.mean())
+
+            # stop once both standard errors are within the tolerance (at least two blocks are drawn, with variance
+            # reduction VARIANCE_REDUCTION_MIN_BLOCKS, since the error is estimated from the spread of the blocks)
+            if len(blocks) >= (2 if self.sampling == 'random' else VARIANCE_REDUCTION_MIN_BLOCKS):
+                mean_monthly = sum_monthly / n
+                se_monthly = np.sqrt(np.maximum(sumsq_monthly / n - mean_monthly**2, 0) / (n - 1))
+                mean_total = sum_total / n
+                se_total = np.sqrt(max(sumsq_total / n - mean_total**2, 0) / (n - 1))
+                if self.sampling != 'random':
+                    se_monthly = np.std(block_monthly, axis=0, ddof=1) / np.sqrt(len(blocks))
+                    se_total = np.std(block_total, ddof=1) / np.sqrt(len(blocks))
+                if np.all(se_monthly <= self.tolerance * np.abs(mean_monthly)) and \
+                        se_total <= self.tolerance * abs(mean_total):
+                    break
+
+        return np.vstack(blocks)
 
     def _recompute(self):
-        # save a snapshot of the current parameter values
-        self._params_dic = {'target_util_mean': self.target_util_mean,
-                            'target_util_std': self.target_util_std,
-                            'target_util_rampup_mean': self.target_util_rampup_mean,
-                            'target_util_rampup_std': self.target_util_rampup_std,
-                            'rampup_time': self.rampup_time,
-                            'duration': self.duration,
-                            'max_units_per_hour': self.max_units_per_hour,
-                            'hours_per_day': self.hours_per_day,
-                            'days_per_month': self.days_per_month
-                            }
-
-        # make beta distributed array
-        OEE = self._generate_timeseries(self.target_util_mean,
-                                        self.target_util_std,
-                                        self.target_util_rampup_mean,
-                                        self.target_util_rampup_std,
-                                        self.rampup_time,
-                                        self.duration)
+        self._snapshot_parameters()
+        if self._load_cached():
+            return
+
+        # make beta distributed array, one child stream per block of runs
+        block_sizes, root_seed, child_seeds = self._plan_runs()
+        if self.adaptive:
+            OEE = self._generate_adaptive(child_seeds, block_sizes)
+        else:
+            OEE = self._generate_runs(child_seeds, block_sizes)
+        self._store_results(OEE, root_seed.entropy)
+
+    def _snapshot_parameters(self):
+        # save a snapshot of the current parameter values (the model stays dirty until its results are stored,
+        # so a failed simulation is repeated on the next call)
+        self._params_dic = parameter.snapshot(self)
+
+    def _cache_key(self):
+        """
+        Returns the key of the current parameter snapshot in the result cache (None for unseeded models).
+        """
+        if self.seed is None:
+            return None
+        return cache.make_key(type(self).__name__, self._params_dic)
+
+    def _load_cached(self):
+        """
+        Loads the results of the current parameter snapshot from the result cache. Returns True on a hit.
+        """
+        key = self._cache_key()
+        cached = cache.results_cache.get(key) if key is not None else None
+        if cached is not None:
+            self._results = cached
+            self._dirty = False
+        return cached is not None
+
+    def _plan_runs(self):
+        """
+        Returns the block sizes of the runs together with the root and the per-block child seed sequences.
+        """
+        block_size = streams.BLOCK_SIZE
+        if self.adaptive and self.sampling != 'random':
+            block_size = VARIANCE_REDUCTION_BLOCK_SIZE
+        block_sizes = streams.block_sizes(self.n_runs, block_size)
+        root_seed, child_seeds = streams.spawn_seeds(self.seed, len(block_sizes))
+        return block_sizes, root_seed, child_seeds
 
+    def _store_results(self, OEE, entropy):
         number_of_units = self._calc_number_of_units(
             OEE, self.max_units_per_hour, self.hours_per_day, self.days_per_month)
 
+        # store the runs as contiguous matrices (float32/int32 or the smallest dtypes in compact mode)
+        if self.compact:
+            max_units = self._calc_number_of_units(1, self.max_units_per_hour, self.hours_per_day, self.days_per_month)
+            OEE = results.as_matrix(OEE, np.float16)
+            number_of_units = results.as_matrix(number_of_units, results.smallest_uint_dtype(max_units))
+        else:
+            OEE = results.as_matrix(OEE, np.float32)
+            number_of_units = results.as_matrix(number_of_units, np.int32)
+
         self._results = {
             'OEE': OEE,
             'number_of_units': number_of_units,
+            'seed': entropy,
+            'n_runs': OEE.shape[0],
+            'summary': {
+                'OEE': results.summarize(OEE),
+                'number_of_units': results.summarize(number_of_units),
+            },
         }
+        self._dirty = False
 
-    def _parameters_changed(self):
-        return (self._params_dic['target_util_mean'] != self.target_util_mean) | \
-               (self._params_dic['target_util_std'] != self.target_util_std) | \
-               (self._params_dic['target_util_rampup_mean'] != self.target_util_rampup_mean) | \
-               (self._params_dic['target_util_rampup_std'] != self.target_util_rampup_std) | \
-               (self._params_dic['rampup_time'] != self.rampup_time) | \
-               (self._params_dic['duration'] != self.duration) | \
-               (self._params_dic['max_units_per_hour'] != self.max_units_per_hour) | \
-               (self._params_dic['hours_per_day'] != self.hours_per_day) | \
-               (self._params_dic['days_per_month'] != self.days_per_month)
+        # share the results with other models and sessions with the same parameters
+        key = self._cache_key()
+        if key is not None:
+            cache.results_cache.put(key, self._results)
 
     def get_results(self):
-        if self._parameters_changed():
+        if self._dirty:
             self._recompute()
         return self._results  # .copy() to protect against data manipulation from outside.
 
@@ -122,5 +277,36 @@ def test():
     mean05 = amodel.get_results()
 
 
+def benchmark(n_seeds=20, n_runs=(250, 1000, 10000)):
+    """
+    Prints the standard error of the expected cumulative number of units (spread over independent replicates) and
+    the mean computation time for all sampling methods, with fixed numbers of runs and in adaptive mode.
+    The models are unseeded, so they are not served from the result cache, and the inverse CDF tables are rebuilt
+    for every replicate, as for a new parameter set.
+    """
+    print(f'{"method":<12}{"n_runs":>8}{"std. error":>14}{"rel. to random":>16}{"time [ms]":>12}')
+    reference = {}
+    for method in sampling.METHODS:
+        for n in list(n_runs) + ['adaptive']:
+            estimates, times, runs = [], [], []
+            for _ in range(n_seeds):
+                sampling._inverse_cdf_table.cache_clear()
+                model = Productivity_Model_Beta_Dist(
+                    target_util_mean=0.7, target_util_std=0.1, target_util_rampup_mean=0.4,
+                    target_util_rampup_std=0.1, sampling=method,
+                    n_runs=N_RUNS if n == 'adaptive' else n, adaptive=n == 'adaptive')
+                start = time.perf_counter()
+                model_results = model.get_results()
+                times.append(time.perf_counter() - start)
+                estimates.append(model_results['number_of_units'].sum(axis=1).mean())
+                runs.append(model_results['n_runs'])
+            error = np.std(estimates, ddof=1)
+            reference.setdefault(n, error)
+            label = f'{np.mean(runs):.0f}*' if n == 'adaptive' else n
+            print(f'{method:<12}{label:>8}{error:>14.3f}{error / reference[n]:>16.3f}{1000 * np.mean(times):>12.1f}')
+    print('* adaptive mode, mean number of runs')
+
+
 if __name__ == '__main__':
     test()
+    benchmark()
@@ -0,0 +1,30 @@
+import numpy as np
+
+# percentiles precomputed for every month of a simulation
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def as_matrix(values, dtype):
+    """
+    Returns the values as a contiguous 2-D (n_runs, n_months) matrix of the given dtype.
+    """
+    return np.ascontiguousarray(np.atleast_2d(values), dtype=dtype)
+
+
+def smallest_uint_dtype(max_value):
+    """
+    Returns the smallest unsigned integer dtype that can hold values up to max_value.
+    """
+    return np.min_scalar_type(max(int(max_value), 0))
+
+
+def summarize(matrix, percentiles=PERCENTILES, axis=0):
+    """
+    Returns the per-month summary statistics (mean, std and percentiles) of a (n_runs, n_months) matrix.
+    Stacked matrices are summarized at once by passing the axis of the runs.
+    """
+    summary = {'mean': matrix.mean(axis=axis, dtype=np.float64),
+               'std': matrix.std(axis=axis, dtype=np.float64)}
+    for p, values in zip(percentiles, np.percentile(matrix, percentiles, axis=axis)):
+        summary[f'p{p}'] = values.astype(np.float64)
+    return summary
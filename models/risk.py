@@ -0,0 +1,28 @@
+import numpy as np
+
+# confidence level of the value at risk
+LEVEL = 0.95
+
+
+def evaluate(total_costs, classic, level=LEVEL):
+    """
+    Returns the risk metrics of the total contract costs, given per run along the last axis (e.g. as
+    (n_payment, n_runs) array for all payment models of a production model):
+    mean, value at risk (costs not exceeded with the given level), conditional value at risk (mean costs beyond
+    the value at risk), probability of exceeding the classic costs and expected shortfall, i.e. the expected
+    excess costs compared to the classic financing (runs below the classic costs count as 0).
+    """
+    total_costs = np.asarray(total_costs, dtype=np.float64)
+    excess = total_costs - classic
+
+    var = np.quantile(total_costs, level, axis=-1)
+    tail = total_costs >= var[..., None]
+    cvar = np.sum(total_costs, axis=-1, where=tail) / np.count_nonzero(tail, axis=-1)
+
+    return {
+        'mean': total_costs.mean(axis=-1),
+        'var': var,
+        'cvar': cvar,
+        'p_exceed': np.mean(excess > 0, axis=-1),
+        'expected_shortfall': np.maximum(excess, 0).mean(axis=-1),
+    }
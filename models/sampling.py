@@ -0,0 +1,85 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy import special
+from scipy.stats import qmc
+
+# sampling methods of the productivity models: plain pseudo-random draws, antithetic pairs,
+# latin hypercube sampling and randomly shifted Sobol sequences (quasi-Monte Carlo)
+METHODS = ('random', 'antithetic', 'lhs', 'sobol')
+
+# nodes of the tabulated inverse beta CDF, equally spaced in logit(u) within +-SPAN (u from about 1e-6 to 1 - 1e-6),
+# so the tails are resolved as well; the interpolation error stays below 1e-4 (for alpha, beta >= 1)
+INVERSE_CDF_NODES = 257
+INVERSE_CDF_SPAN = 14
+
+
+def uniforms(method, n, dim, rng):
+    """
+    Returns a (n, dim) array of uniform values on [0, 1) for the given sampling method, drawn from the
+    random generator (for the Sobol sequence the generator only shifts the sequence).
+    """
+    if method == 'random':
+        return rng.random((n, dim))
+    if method == 'antithetic':
+        # the second half mirrors the first one (u -> 1-u), so every run has a partner with the opposite effect
+        half = rng.random(((n + 1) // 2, dim))
+        return np.vstack([half, 1 - half])[:n]
+    if method == 'lhs':
+        # exactly one value in each of the n strata per dimension, strata randomly paired between dimensions
+        strata = rng.random((n, dim)).argsort(axis=0)
+        return (strata + rng.random((n, dim))) / n
+    if method == 'sobol':
+        # randomly shifted (modulo 1) Sobol sequence: every block is an independent randomization of the same points
+        return (_sobol_points(n, dim) + rng.random(dim)) % 1
+    raise ValueError(f'unknown sampling method: {method}')
+
+
+@lru_cache(maxsize=64)
+def _sobol_points(n, dim):
+    # the sequence is balanced for powers of 2, so the next power of 2 is drawn and truncated
+    points = qmc.Sobol(d=dim, scramble=False).random_base2(int(np.ceil(np.log2(max(n, 1)))))[:n]
+    points.flags.writeable = False
+    return points
+
+
+@lru_cache(maxsize=1024)
+def _inverse_cdf_table(alpha, beta):
+    # the exact inverse is expensive, so it is evaluated once per distribution on the nodes only
+    nodes = np.linspace(-INVERSE_CDF_SPAN, INVERSE_CDF_SPAN, INVERSE_CDF_NODES)
+    values = special.betaincinv(alpha, beta, special.expit(nodes))
+    nodes.flags.writeable = False
+    values.flags.writeable = False
+    return nodes, values
+
+
+def inverse_cdf(alpha, beta, u):
+    """
+    Returns the inverse beta CDF of the uniform values, interpolated in a table per distribution. The parameters are
+    scalars or one value per entry of the last axis of u (e.g. per month).
+    """
+    u = np.asarray(u, dtype=np.float64)
+    alpha = np.broadcast_to(np.asarray(alpha, dtype=np.float64), u.shape[-1:])
+    beta = np.broadcast_to(np.asarray(beta, dtype=np.float64), u.shape[-1:])
+    with np.errstate(divide='ignore'):
+        t = special.logit(u)
+
+    # one table and one interpolation per distinct distribution
+    x = np.empty_like(u)
+    pairs, inverse = np.unique(np.stack([alpha, beta], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    for i, (a, b) in enumerate(pairs):
+        columns = np.flatnonzero(inverse == i)
+        nodes, values = _inverse_cdf_table(float(a), float(b))
+        x[..., columns] = np.interp(t[..., columns], nodes, values)
+    return x
+
+
+def beta(alpha, beta, size, rng, u=None):
+    """
+    Returns beta distributed values, drawn from the random generator or, if uniform values are given,
+    by the inverse cumulative distribution function.
+    """
+    if u is None:
+        return rng.beta(alpha, beta, size=size)
+    return inverse_cdf(alpha, beta, u)
@@ -0,0 +1,97 @@
+import numpy as np
+
+from models import payment_model
+
+# payment model parameters stacked along the payment axis of the scenario grid
+PAYMENT_PARAMETERS = ('payment_upfront', 'payment_per_month', 'payment_per_production_unit',
+                      'payment_per_production_time', 'service_costs', 'payment_floor_per_month',
+                      'payment_cap_per_month', 'min_contract_term', 'max_contract_term')
+
+
+def payment_key(payment_models, exclude=('payment_upfront',)):
+    """
+    Returns a hashable snapshot of the parameters that determine the rates of the payment models.
+    """
+    return tuple(tuple(float(getattr(model, name)) for name in PAYMENT_PARAMETERS if name not in exclude)
+                 for model in payment_models)
+
+
+def stack_payment_parameters(payment_models, shape=(-1,)):
+    """
+    Returns a dictionary with one array per payment model parameter, reshaped to the given broadcasting shape.
+    """
+    return {name: np.array([getattr(model, name) for model in payment_models], dtype=np.float64).reshape(shape)
+            for name in PAYMENT_PARAMETERS}
+
+
+def _rates(units, production_time, params):
+    return payment_model.compute_rates(units, production_time,
+                                       params['payment_per_month'], params['payment_per_production_unit'],
+                                       params['payment_per_production_time'], params['service_costs'],
+                                       params['payment_floor_per_month'], params['payment_cap_per_month'],
+                                       params['min_contract_term'], params['max_contract_term'])
+
+
+def evaluate_grid(production_models, payment_models, include_upfront=True):
+    """
+    Evaluates all production x payment model combinations at once. Returns the expected monthly rates and
+    cumulative costs as (n_production, n_payment, n_months) tensors and the indices of the cheapest combination
+    (lowest expected cumulative costs at the end of the horizon). Production models with different durations are
+    compared over the shortest one. Without the upfront payments, the costs can be shifted for any upfront.
+    """
+    prd_results = [model.get_results() for model in production_models]
+    n_months = min(model.duration for model in production_models)
+
+    # expected units and production time per month, stacked to (n_production, 1, n_months)
+    hours = np.array([model.hours_per_day * model.days_per_month for model in production_models], dtype=np.float64)
+    units_mean = np.stack([r['summary']['number_of_units']['mean'][:n_months] for r in prd_results])[:, None, :]
+    oee_mean = np.stack([r['summary']['OEE']['mean'][:n_months] for r in prd_results])
+    time_mean = (oee_mean * hours[:, None])[:, None, :]
+
+    # payment parameters stacked to (1, n_payment, 1)
+    params = stack_payment_parameters(payment_models, (1, -1, 1))
+
+    # the rates are linear in the units unless a cap or a floor above the fixed fees is active,
+    # so for linear payment models the expected rates follow from the expected units directly
+    rates = _rates(units_mean, time_mean, params)
+
+    # non-linear payment models are averaged over the individual runs
+    nonlinear = (params['payment_cap_per_month'] > 0) | \
+                (params['payment_floor_per_month'] > params['payment_per_month'] + params['service_costs'])
+    nonlinear = np.flatnonzero(nonlinear.ravel())
+    if nonlinear.size:
+        subset = {name: values.ravel()[nonlinear][:, None, None] for name, values in params.items()}
+        for prd_id, (model, results) in enumerate(zip(production_models, prd_results)):
+            units = results['number_of_units'][:, :n_months]
+            production_time = results['OEE'][:, :n_months] * hours[prd_id] \
+                if np.any(subset['payment_per_production_time']) else 0
+            rates[prd_id, nonlinear] = _rates(units, production_time, subset).mean(axis=1)
+
+    costs = np.cumsum(rates, axis=-1)
+    final_costs = costs[:, :, -1] + params['payment_upfront'][:, :, 0]
+    if include_upfront:
+        costs += params['payment_upfront']
+    best = np.unravel_index(np.argmin(final_costs), final_costs.shape)
+
+    return {'rates': rates, 'costs': costs, 'best': (int(best[0]), int(best[1]))}
+
+
+def upfront_sweep(costs, upfronts, classic):
+    """
+    Evaluates all upfront payments at once. The costs are the cumulative costs without upfront payment as
+    (n_production, n_payment, n_months) tensor (see evaluate_grid), classic the cumulative costs of the classic
+    financing per upfront payment as (n_upfronts, n_months) array. Returns the cumulative and final costs of every
+    combination per upfront payment and the break-even month, i.e. the first month (1-based) in which the costs of a
+    combination reach the classic costs (0 if they never do).
+    """
+    upfronts = np.asarray(upfronts, dtype=np.float64)
+    classic = np.asarray(classic, dtype=np.float64)
+    n_months = min(costs.shape[-1], classic.shape[-1])
+
+    # the upfront payment only shifts the cumulative costs: (n_upfronts, n_production, n_payment, n_months)
+    curves = upfronts[:, None, None, None] + costs[None, :, :, :n_months]
+    reached = curves >= classic[:, None, None, :n_months]
+    break_even = np.where(reached.any(axis=-1), reached.argmax(axis=-1) + 1, 0)
+
+    return {'upfronts': upfronts, 'classic': classic, 'costs': curves, 'final_costs': curves[..., -1],
+            'break_even': break_even}
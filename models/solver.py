@@ -0,0 +1,195 @@
+import numpy as np
+
+from models import payment_model
+
+# number of monthly fees evaluated by the grid search
+N_FEES = 41
+
+# maximum number of (runs x months) values per candidate block, bounds the memory of the evaluation
+BLOCK_VALUES = 4 * 1024**2
+
+# root-finding tolerances on the price per unit and on the costs, maximum number of iterations
+TOLERANCE = 1e-6
+COST_TOLERANCE = 1e-3
+MAX_ITERATIONS = 60
+
+# expected total costs closer than this are regarded as equal, ties go to the lowest monthly fee
+TIE_TOLERANCE = 0.01
+
+# price per unit regarded as unlimited when checking whether a target can be reached at all
+MAX_PPU = 1e12
+
+
+def _production(production_model):
+    # simulated units and production time (runs x months) of a production model
+    results = production_model.get_results()
+    hours = production_model.hours_per_day * production_model.days_per_month
+    return results['number_of_units'], results['OEE'] * hours
+
+
+def expected_costs(template, number_of_units, production_time, payment_per_month, payment_per_production_unit):
+    """
+    Returns the expected cumulative costs (mean over the runs, including the upfront payment) of the template
+    payment model with its monthly fee and price per unit replaced by the given candidates. The candidates broadcast
+    to a 1d array, the result has the shape (n_candidates, n_months).
+    """
+    fees, ppus = np.broadcast_arrays(np.atleast_1d(np.asarray(payment_per_month, dtype=np.float64)),
+                                     np.atleast_1d(np.asarray(payment_per_production_unit, dtype=np.float64)))
+    number_of_units = np.atleast_2d(number_of_units)
+
+    # without floor and cap the rates are linear in the units, so the expected units are sufficient
+    if template.payment_floor_per_month <= 0 and template.payment_cap_per_month <= 0:
+        number_of_units = number_of_units.mean(axis=0, keepdims=True)
+        if np.ndim(production_time):
+            production_time = production_time.mean(axis=0, keepdims=True)
+
+    # evaluate the candidates block by block
+    block = max(1, BLOCK_VALUES // number_of_units.size)
+    rates = np.empty((fees.size, number_of_units.shape[-1]))
+    for start in range(0, fees.size, block):
+        candidates = slice(start, start + block)
+        rates[candidates] = payment_model.compute_rates(
+            number_of_units, production_time,
+            fees[candidates, None, None], ppus[candidates, None, None],
+            template.payment_per_production_time, template.service_costs,
+            template.payment_floor_per_month, template.payment_cap_per_month,
+            template.min_contract_term, template.max_contract_term).mean(axis=1)
+
+    return template.payment_upfront + np.cumsum(rates, axis=-1)
+
+
+def break_even_ppu(template, number_of_units, production_time, payment_per_month, target, month):
+    """
+    Returns the price per unit for every monthly fee, such that the expected cumulative costs reach the target costs
+    in the given month (1-based), i.e. are at least the target and exceed it by at most the cost tolerance. The costs
+    grow monotonically with the price per unit, so all fees are solved at once by bracketing root-finding.
+    Fees without a solution (already too expensive, or capped below the target) are NaN.
+    """
+    fees = np.atleast_1d(np.asarray(payment_per_month, dtype=np.float64))
+
+    def excess(ppus, active=slice(None)):
+        return expected_costs(template, number_of_units, production_time, fees[active], ppus)[:, month - 1] - target
+
+    # the target is reachable if the fee alone stays below and the costs at an unlimited price per unit (i.e. the
+    # cap, if there is one) reach it
+    lower = np.zeros_like(fees)
+    solvable = (excess(lower) <= 0) & (excess(np.full_like(fees, MAX_PPU)) >= 0)
+
+    # bracket the root: without a cap the costs at the linear estimate are at least the target
+    units = np.atleast_2d(number_of_units)[:, :month].sum(axis=1).mean()
+    upper = np.full_like(fees, max(target - template.payment_upfront, 0) / max(units, 1) + 1)
+    active = np.flatnonzero(solvable)
+    for _ in range(MAX_ITERATIONS):
+        active = active[excess(upper[active], active) < 0]
+        if not active.size:
+            break
+        upper[active] *= 2
+
+    # false position (Illinois variant) of all fees at once: the costs are piecewise linear in the price per unit,
+    # so this converges in a few iterations while always keeping the root bracketed
+    ppus = upper.copy()
+    f_lower = np.zeros_like(fees)
+    f_upper = np.zeros_like(fees)
+    active = np.flatnonzero(solvable)
+    if active.size:
+        f_lower[active] = excess(lower[active], active)
+        f_upper[active] = excess(upper[active], active)
+    side = np.zeros(fees.shape, dtype=np.int8)
+    for _ in range(MAX_ITERATIONS):
+        if not active.size:
+            break
+        lo, hi, f_lo, f_hi = lower[active], upper[active], f_lower[active], f_upper[active]
+        slope = f_hi - f_lo
+        x = np.where(slope > 0, (lo * f_hi - hi * f_lo) / np.where(slope > 0, slope, 1), (lo + hi) / 2)
+        f_x = excess(x, active)
+
+        # move the bound on the side of the new point, halve the value of a bound that is kept twice in a row
+        above = f_x > 0
+        upper[active] = np.where(above, x, hi)
+        f_upper[active] = np.where(above, f_x, np.where(side[active] < 0, f_hi / 2, f_hi))
+        lower[active] = np.where(above, lo, x)
+        f_lower[active] = np.where(above, np.where(side[active] > 0, f_lo / 2, f_lo), f_x)
+        side[active] = np.where(above, 1, -1)
+
+        # the solution is always taken from the upper side, so the costs do reach the target
+        reached = f_x >= 0
+        ppus[active] = np.where(reached, x, upper[active])
+        converged = (reached & (f_x <= COST_TOLERANCE)) | (upper[active] - lower[active] <= TOLERANCE)
+        active = active[~converged]
+
+    return np.where(solvable, ppus, np.nan)
+
+
+def optimize(template, production_model, classic, month, n_fees=N_FEES):
+    """
+    Searches the monthly fee and price per unit of the template payment model, that break even with the classic
+    financing (cumulative costs per month) in the given month and have the lowest expected costs over the whole
+    horizon of the production model. Breaking even in the month means that the expected costs reach the classic
+    costs there for the first time (see scenarios.upfront_sweep). Equal costs (e.g. when breaking even in the last
+    month) are decided in favour of the lowest monthly fee. Returns the optimal offer together with all evaluated
+    candidates, or None if no candidate breaks even in the month.
+    """
+    number_of_units, production_time = _production(production_model)
+    if not template.payment_per_production_time:
+        production_time = 0
+    target = classic[month - 1]
+
+    # grid of monthly fees: the fixed part alone must not exceed the target
+    max_fee = max((target - template.payment_upfront) / month - template.service_costs, 0)
+    fees = np.linspace(0, max_fee, n_fees)
+
+    # price per unit of every fee, then the expected costs of all candidates
+    ppus = break_even_ppu(template, number_of_units, production_time, fees, target, month)
+    solved = np.flatnonzero(~np.isnan(ppus))
+    if not solved.size:
+        return None
+    costs = expected_costs(template, number_of_units, production_time, fees[solved], ppus[solved])
+
+    # candidates reaching the classic costs before the month break even earlier
+    first = np.all(costs[:, :month - 1] < classic[:month - 1], axis=1)
+    if not first.any():
+        return None
+    solved, costs = solved[first], costs[first]
+
+    # lowest expected total costs, the fees are ascending so ties go to the lowest fee
+    total = costs[:, -1]
+    best = np.flatnonzero(total <= total.min() + TIE_TOLERANCE)[0]
+
+    return {
+        'payment_per_month': float(fees[solved[best]]),
+        'payment_per_production_unit': float(ppus[solved[best]]),
+        'costs': costs[best],
+        'candidates': {'payment_per_month': fees, 'payment_per_production_unit': ppus},
+    }
+
+
+def test():
+    from models import classic_financing, productivity_model_beta_dist
+    production = productivity_model_beta_dist.Productivity_Model_Beta_Dist(
+        target_util_mean=0.7, target_util_rampup_mean=0.3, seed=0, n_runs=2000)
+    number_of_units = production.get_results()['number_of_units']
+    template = payment_model.Payment_Model(payment_upfront=50000)
+    month = production.duration
+
+    # breaking even in the last month: all candidates have the same total costs, the lowest fee wins
+    classic = classic_financing.compute_costs(month, 150000, 50000, 0.03, 1000, 100)
+    offer = optimize(template, production, classic, month)
+    fees = offer['candidates']['payment_per_month']
+    ppus = offer['candidates']['payment_per_production_unit']
+    assert offer['payment_per_month'] == fees[~np.isnan(ppus)].min()
+    assert optimize(template, production, classic, month)['payment_per_production_unit'] == \
+        offer['payment_per_production_unit']
+
+    # with high maintenance most candidates reach the classic costs before the month, the offer must not
+    classic = classic_financing.compute_costs(month, 150000, 50000, 0.03, 1000, 1000)
+    offer = optimize(template, production, classic, month)
+    fees = offer['candidates']['payment_per_month']
+    ppus = offer['candidates']['payment_per_production_unit']
+    costs = expected_costs(template, number_of_units, 0, fees, ppus)
+    assert np.any(costs[:, :month - 1] >= classic[:month - 1])
+    assert np.argmax(offer['costs'] >= classic) + 1 == month
+    assert offer['costs'][month - 1] - classic[month - 1] <= COST_TOLERANCE
+
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,35 @@
+import numpy as np
+
+# number of runs drawn from one child stream; fixed so that results do not depend on how blocks are distributed
+BLOCK_SIZE = 1000
+
+
+def block_sizes(n_runs, block_size=BLOCK_SIZE):
+    """
+    Returns the number of runs of each block when n_runs are split into blocks of block_size.
+    """
+    n_full, rest = divmod(n_runs, block_size)
+    return [block_size] * n_full + ([rest] if rest else [])
+
+
+def spawn_seeds(seed, n_blocks):
+    """
+    Returns the root seed sequence and one child seed sequence per block.
+    The i-th child only depends on the seed and i, so any subset of blocks can be drawn by any worker.
+    """
+    root = np.random.SeedSequence(seed)
+    return root, root.spawn(n_blocks)
+
+
+def shard(items, n_workers):
+    """
+    Splits items into at most n_workers contiguous chunks of (almost) equal length.
+    """
+    n_workers = max(1, min(n_workers, len(items)))
+    size, rest = divmod(len(items), n_workers)
+    chunks, start = [], 0
+    for i in range(n_workers):
+        stop = start + size + (1 if i < rest else 0)
+        chunks.append(items[start:stop])
+        start = stop
+    return chunks
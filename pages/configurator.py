@@ -1,12 +1,12 @@
 # 3rd party modules
 import streamlit as st
-import pandas as pd
 import numpy as np
 from babel.numbers import format_decimal
 
 # custom modules
 from languages import localization
 from tools import loader
+from pages import setup
 
 
 # builds/shows the configurator page
@@ -86,15 +86,14 @@ def show():
     # ========================================================================================================== Options
     with col5:
 
-        # get options
-        options = st.session_state['options_all']
-
-        # options configuration
+        # options configuration: selected option ids with name and upfront payment, and their running total
         if 'options' not in st.session_state:
-            st.session_state['options'] = pd.DataFrame()
+            st.session_state['options'] = dict()
+            st.session_state['options_costs'] = 0
+        selected = st.session_state['options']
 
         # available options and categories
-        compatible = get_compatible_options(machine['Id'], options)
+        compatible = get_compatible_options(machine['Id'])
         categories = compatible['Category'].unique()
 
         # show options and update configuration
@@ -103,22 +102,20 @@ def show():
             # st.markdown(f'#### {category}s')
             for index, option in compatible[compatible['Category'] == category].iterrows():
 
-                # check if options exists in session state
-                value = not st.session_state['options'].empty and \
-                        option['Name'] in st.session_state['options'].values
+                # check if option is selected
+                value = option['Id'] in selected
 
                 # get user input
                 checked = st.checkbox(f"{option['Name']}", value=value)
 
                 # case 1: user selected new option
                 if checked and not value:
-                    st.session_state['options'] = st.session_state['options'].append(option)
-                    raise st.script_runner.RerunException(st.script_request_queue.RerunData(None))
+                    selected[option['Id']] = (option['Name'], option['Payment upfront'])
+                    st.session_state['options_costs'] += option['Payment upfront']
 
                 # case 2: user de-selected existing option
                 if not checked and value:
-                    st.session_state['options'] = st.session_state['options'].drop(index=index)
-                    raise st.script_runner.RerunException(st.script_request_queue.RerunData(None))
+                    st.session_state['options_costs'] -= selected.pop(option['Id'])[1]
 
     # ============================================================================================================ Costs
     with col7:
@@ -140,9 +137,9 @@ def show():
         costs += machine['Installation cost']
 
         # selected options
-        for index, option in st.session_state['options'].iterrows():
-            table += f'''\n| {option['Name']} | {format_decimal(option['Payment upfront'], format='#,##0.00', locale='de_CH')} |'''
-            costs += option['Payment upfront']
+        for name, payment_upfront in st.session_state['options'].values():
+            table += f'''\n| {name} | {format_decimal(payment_upfront, format='#,##0.00', locale='de_CH')} |'''
+        costs += st.session_state['options_costs']
 
         # show table and total costs
         st.markdown(table)
@@ -150,14 +147,7 @@ def show():
         st.session_state['machine']['costs'] = np.int(costs)
 
 
-@st.cache
-def get_compatible_options(machine_id, options):
-
-    rows_to_drop = []
-    for index, row in options.iterrows():
-        if isinstance(row['Compatible machines'], str):
-            if not any(machine_id in m for m in row['Compatible machines'].split(',')):
-                rows_to_drop.append(index)
-    options = options.drop(rows_to_drop)
+def get_compatible_options(machine_id):
 
-    return options
+    # indexed lookup of the options compatible with the machine
+    return loader.get_compatible(setup.INPUT_FILE, setup.OPTIONS_SHEET, 'Compatible machines', machine_id)
@@ -5,8 +5,6 @@ import streamlit as st
 from languages import localization
 from tools import loader
 
-import time
-
 # input file
 INPUT_FILE = 'database/datamodel.xlsx'
 MACHINES_SHEET = 'Machines'
@@ -31,30 +29,16 @@ def run():
 
         # load machines
         progress_text.markdown(_('...machines'))
-        time.sleep(0.5)
         st.session_state['machines_all'] = loader.get_data(INPUT_FILE, MACHINES_SHEET)
         st.session_state['machine'] = st.session_state['machines_all'].iloc[0]
-        progress_bar.progress(25)
-
-        # load options
-        progress_text.markdown(_('...options'))
-        time.sleep(0.5)
-        st.session_state['options_all'] = loader.get_data(INPUT_FILE, OPTIONS_SHEET)
         progress_bar.progress(50)
 
         # load production models
         progress_text.markdown(_('...production models'))
-        time.sleep(0.5)
         st.session_state['production_all'] = loader.get_data(INPUT_FILE, PRODUCTION_SHEET)
-        progress_bar.progress(75)
-
-        # load payment models
-        progress_text.markdown(_('...payment models'))
-        time.sleep(0.5)
-        st.session_state['payment_all'] = loader.get_data(INPUT_FILE, PAYMENT_SHEET)
         progress_bar.progress(100)
 
-        time.sleep(0.2)
+        # options and payment models are looked up in the process-wide datamodel (see loader.get_compatible)
 
     # set default page
     st.session_state['page'] = 'Settings'
@@ -14,8 +14,15 @@ from babel.numbers import format_decimal
 
 # custom modules
 from languages import localization
-from tools import loader
-from models import payment_model, productivity_model_beta_dist
+from tools import charts, loader
+from pages import setup
+from models import classic_financing, payment_model, productivity_model_beta_dist, executor, risk, sampling, scenarios, solver
+
+# seed of the production models: identical scenarios give identical results and are served from the cache
+SEED = 0
+
+# step of the upfront payment slider [CHF]
+UPFRONT_STEP = 10000
 
 
 def show():
@@ -37,8 +44,8 @@ def show():
         # upfront payment slider
         st.markdown('<br>', unsafe_allow_html=True)
         upfront_payment = st.slider(_('Upfront payment [CHF]'), 0, st.session_state['machine']['costs'],
-                                    int(st.session_state['machine']['costs']/3),
-                                    step=10000)
+                                    get_upfront_default(st.session_state['machine']['costs']),
+                                    step=UPFRONT_STEP)
 
         # interest rates slider
         interest_rates = 0.03
@@ -65,7 +72,7 @@ def show():
             selected_model = st.selectbox(_('Select'), options=model_list, index=0, key='production_model_select')
 
             # create default production model object
-            model_object = productivity_model_beta_dist.Productivity_Model_Beta_Dist()
+            model_object = productivity_model_beta_dist.Productivity_Model_Beta_Dist(seed=SEED, adaptive=True)
             model_object.name = 'new_model'
 
             # check if new model or not
@@ -142,6 +149,11 @@ def show():
                                                           step=0.1,
                                                           help=_('Fluctuation of machine utilization at start of ramp-up in percentage of the average utilization')) / 100
 
+                # sampling method
+                sampling_method = st.selectbox(label=_('Sampling'), options=sampling.METHODS,
+                                               index=sampling.METHODS.index(model_object.sampling),
+                                               help=_('antithetic, lhs and sobol reach the same accuracy with fewer runs'))
+
                 # model name
                 name = st.text_input(_('Model Name'), value=model_object.name)
 
@@ -165,6 +177,7 @@ def show():
                             model_object.rampup_time = ramp_up_time
                             model_object.target_util_rampup_mean = target_util_ramp_up_mean
                             model_object.target_util_rampup_std = target_util_ramp_up_std*target_util_ramp_up_mean
+                            model_object.sampling = sampling_method
                             model_object.name = name
                             st.session_state['production_models'].append(model_object)
                             raise st.script_runner.RerunException(st.script_request_queue.RerunData(None))
@@ -186,6 +199,7 @@ def show():
                                 st.session_state['production_models'][index].rampup_time = ramp_up_time
                                 st.session_state['production_models'][index].target_util_rampup_mean = target_util_ramp_up_mean
                                 st.session_state['production_models'][index].target_util_rampup_std = target_util_ramp_up_std
+                                st.session_state['production_models'][index].sampling = sampling_method
                                 st.session_state['production_models'][index].name = name
                                 raise st.script_runner.RerunException(st.script_request_queue.RerunData(None))
 
@@ -217,8 +231,7 @@ def show():
             if selected_model == _('New'):
 
                 # load pre-defined and compatible payment models
-                models = st.session_state['payment_all']
-                compatible = get_compatible_models(models)
+                compatible = get_compatible_models()
                 model_list = [_('None')]
                 if not compatible.empty:
                     model_list += list(compatible['Name'])
@@ -235,6 +248,10 @@ def show():
                     model_object.payment_upfront = predefined_model['Payment upfront']
                     model_object.payment_per_month = predefined_model['Payment / month']
                     model_object.payment_per_production_unit = predefined_model['Payment / production unit']
+                    model_object.payment_floor_per_month = np.nan_to_num(predefined_model['Payment floor / month'])
+                    model_object.payment_cap_per_month = np.nan_to_num(predefined_model['Payment cap / month'])
+                    model_object.min_contract_term = int(np.nan_to_num(predefined_model['Minimum contract term [months]']))
+                    model_object.max_contract_term = int(np.nan_to_num(predefined_model['Maximum contract term [months]']))
                     model_object.name = predefined_model['Name']
 
             else:
@@ -257,6 +274,22 @@ def show():
                                       value=model_object.payment_per_production_unit,
                                       help='prize per unit')
 
+                # floor and cap per month
+                floor = st.number_input(label=_('Payment floor per month'),
+                                        value=float(model_object.payment_floor_per_month),
+                                        help=_('minimal monthly payment'))
+                cap = st.number_input(label=_('Payment cap per month'),
+                                      value=float(model_object.payment_cap_per_month),
+                                      help=_('maximal monthly payment (0 = no cap)'))
+
+                # contract term
+                min_term = st.number_input(label=_('Minimum contract term [months]'),
+                                           value=int(model_object.min_contract_term),
+                                           help=_('months billed at least'))
+                max_term = st.number_input(label=_('Maximum contract term [months]'),
+                                           value=int(model_object.max_contract_term),
+                                           help=_('months billed at most (0 = no limit)'))
+
                 # model name
                 name = st.text_input(_('Model Name'), value=model_object.name)
 
@@ -274,6 +307,10 @@ def show():
                             # model_object.payment_upfront = upfront
                             model_object.payment_per_month = fix
                             model_object.payment_per_production_unit = ppu
+                            model_object.payment_floor_per_month = floor
+                            model_object.payment_cap_per_month = cap
+                            model_object.min_contract_term = min_term
+                            model_object.max_contract_term = max_term
                             model_object.name = name
                             st.session_state['payment_models'].append(model_object)
                             raise st.script_runner.RerunException(st.script_request_queue.RerunData(None))
@@ -289,6 +326,10 @@ def show():
                                 # st.session_state['payment_models'][index].payment_upfront = upfront
                                 st.session_state['payment_models'][index].payment_per_month = fix
                                 st.session_state['payment_models'][index].payment_per_production_unit = ppu
+                                st.session_state['payment_models'][index].payment_floor_per_month = floor
+                                st.session_state['payment_models'][index].payment_cap_per_month = cap
+                                st.session_state['payment_models'][index].min_contract_term = min_term
+                                st.session_state['payment_models'][index].max_contract_term = max_term
                                 st.session_state['payment_models'][index].name = name
                                 break
                         raise st.script_runner.RerunException(st.script_request_queue.RerunData(None))
@@ -301,6 +342,41 @@ def show():
                                 break
                         raise st.script_runner.RerunException(st.script_request_queue.RerunData(None))
 
+    # ================================================================================================= offer optimizer
+
+    # payment model that breaks even with the classic financing in a given month at the lowest expected costs
+    with col2:
+        if len(st.session_state['payment_models']) > 0 and len(st.session_state['production_models']) > 0:
+            with st.expander(_('Offer Optimizer')):
+                with st.form(key='offer-optimizer-form'):
+
+                    # production and payment model (the template keeps floor, cap, terms and service costs)
+                    prd_name = st.selectbox(_('Production Model'),
+                                            options=[pm.name for pm in st.session_state['production_models']])
+                    pay_name = st.selectbox(_('Payment Model'),
+                                            options=[pm.name for pm in st.session_state['payment_models']])
+                    prd_model = [pm for pm in st.session_state['production_models'] if pm.name == prd_name][0]
+                    pay_model = [pm for pm in st.session_state['payment_models'] if pm.name == pay_name][0]
+
+                    # target break-even month
+                    month = st.number_input(_('Break-even month'), min_value=1, max_value=int(prd_model.duration),
+                                            value=int(prd_model.duration), step=1,
+                                            help=_('month in which the costs reach the classic financing'))
+
+                    if st.form_submit_button(_('Optimize')):
+                        pay_model.payment_upfront = upfront_payment
+                        classic = classic_financing.classic_costs(
+                            int(prd_model.duration), float(st.session_state['machine']['costs']),
+                            float(upfront_payment), interest_rates, amortization,
+                            float(st.session_state['machine']['Maintenance cost / month']))
+                        offer = solver.optimize(pay_model, prd_model, classic, int(min(month, prd_model.duration)))
+                        if offer is None:
+                            st.error(_('no offer breaks even in this month'))
+                        else:
+                            pay_model.payment_per_month = offer['payment_per_month']
+                            pay_model.payment_per_production_unit = offer['payment_per_production_unit']
+                            raise st.script_runner.RerunException(st.script_request_queue.RerunData(None))
+
     # =================================================================================================== list and plots
 
     with col1:
@@ -311,6 +387,7 @@ def show():
             cumsum1 = st.empty()  # figure
             refsum = st.empty()  # classic model
             cumsum2 = st.empty()  # table
+            risk_table = st.empty()  # risk metrics
 
             st.markdown('<br><hr><br>', unsafe_allow_html=True)
 
@@ -325,156 +402,117 @@ def show():
             color_index = 0
             color_delta = 2
 
-            # compute classic payment
+            # many line traces are rendered with WebGL
+            webgl = charts.use_webgl(3 * len(st.session_state['production_models']) *
+                                     len(st.session_state['payment_models']))
+
+            # recompute changed production models in parallel
+            executor.recompute(st.session_state['production_models'])
+
+            # set payment upfront
+            for pay_model in st.session_state['payment_models']:
+                pay_model.payment_upfront = upfront_payment
+
+            # all results below are cached without the upfront payment, which only shifts the cumulative costs
+            prd_results_all = tuple(pm.get_results() for pm in st.session_state['production_models'])
+            pay_key = scenarios.payment_key(st.session_state['payment_models'])
+
+            # expected costs of all production x payment combinations and the "best" one (best = lowest costs)
+            grid = get_cached('grid', prd_results_all, pay_key,
+                              lambda: scenarios.evaluate_grid(st.session_state['production_models'],
+                                                              st.session_state['payment_models'],
+                                                              include_upfront=False))
+            best_prd, best_pay = grid['best']
+            if 'best' not in st.session_state:
+                st.session_state['best'] = dict()
+            st.session_state['best']['prd'] = st.session_state['production_models'][best_prd]
+            st.session_state['best']['pay'] = st.session_state['payment_models'][best_pay]
+
+            # classic payment and cumulative costs of all combinations for every value of the upfront payment slider,
+            # so moving the slider is a lookup (a value outside the precomputed ones is added to the sweep)
             n_months = st.session_state['production_models'][0].duration
             months = list(range(1, n_months+1))
-            months_rev = months[::-1]
-            classic = compute_classic_payment(n_months, upfront_payment, interest_rates, amortization,
-                                              st.session_state['machine']['Maintenance cost / month'],
-                                              st.session_state['machine']['costs'])
+            machine_costs = float(st.session_state['machine']['costs'])
+            maintenance = float(st.session_state['machine']['Maintenance cost / month'])
+            upfronts = get_upfront_values(st.session_state['machine']['costs'])
+            if upfront_payment not in upfronts:
+                upfronts = tuple(sorted(upfronts + (upfront_payment,)))
+            sweep = get_cached('sweep', (grid,),
+                               (n_months, machine_costs, interest_rates, amortization, maintenance, upfronts),
+                               lambda: compute_upfront_sweep(grid, n_months, machine_costs, upfronts, interest_rates,
+                                                             amortization, maintenance))
+            step = upfronts.index(upfront_payment)
+            classic = sweep['classic'][step]
 
             fig_cumsum.add_trace(go.Scatter(x=months, y=classic,
                                             line_color='rgb(255,0,0)',
                                             name=_('classic'),
                                             showlegend=True))
 
-            cumsum_list = f'''| Simulation | Production Model | Payment Model | {_('Cumulative Costs')} | {_('Difference')} |
-                              |------------|------------------|---------------|-------------------------|------------------:|'''
+            cumsum_list = f'''| Simulation | Production Model | Payment Model | {_('Cumulative Costs')} | {_('Difference')} | {_('Break-even month')} |
+                              |------------|------------------|---------------|-------------------------|------------------:|------------------:|'''
+
+            risk_list = f'''| Simulation | {_('Mean')} | VaR {risk.LEVEL:.0%} | CVaR {risk.LEVEL:.0%} | {_('P(costs > classic)')} | {_('Expected shortfall')} |
+                           |------------|-----------:|-----------:|-----------:|-----------:|-----------:|'''
 
             refsum.markdown(f'''**{_('classic')}**: **{format_decimal(classic[-1], format='#,##0.00', locale='de_CH')} CHF**''')
 
             # loop through the production models
-            min_costs = -1
             for prd_id, prd_model in enumerate(st.session_state['production_models']):
 
-                # compute units per month
-                n_units = prd_model.get_results()['number_of_units']
-                n_units_2d = np.vstack(n_units)
-                n_units_mean = np.mean(n_units_2d, 0)
-                n_units_std = np.std(n_units_2d, 0)
-                n_units_upper = n_units_mean+(1.96*n_units_std)
-                n_units_lower = n_units_mean-(1.96*n_units_std)
-                n_units_lower = n_units_lower[::-1]
-
-                if plot_type == 'line chart':
-
-                    fig_units.add_trace(go.Scatter(
-                        x=months + months_rev,
-                        y=np.hstack([n_units_upper, n_units_lower]),
-                        fill='toself',
-                        fillcolor=f'rgba({colors[color_index][4:-1]},0.2)',
-                        line_color=f'rgba({colors[color_index][4:-1]},0)',
-                        showlegend=False,
-                        name=prd_model.name))
-
-                    fig_units.add_trace(go.Scatter(
-                        x=months,
-                        y=n_units[0],
-                        line=dict(color=f'rgba({colors[color_index][4:-1]},0.5)', width=1, dash='dash'),
-                        line_shape='spline',
-                        showlegend=False,
-                        name=prd_model.name))
-
-                    fig_units.add_trace(go.Scatter(
-                        x=months,
-                        y=n_units_mean,
-                        line_color=colors[color_index],
-                        showlegend=True,
-                        name=prd_model.name))
+                # units per month and their precomputed statistics
+                prd_results = prd_results_all[prd_id]
+                color = colors[color_index % len(colors)]
+                for trace in get_cached(('units', prd_id), (prd_results,),
+                                        (plot_type, webgl, color, prd_model.name, n_months),
+                                        lambda: build_unit_traces(prd_results, plot_type, webgl, color,
+                                                                  prd_model.name, months)):
+                    fig_units.add_trace(trace)
 
-                else:
+                # monthly rates and cumulative costs of all runs for all payment models at once
+                pay_results = get_cached(('payments', prd_id), (prd_results,), pay_key,
+                                         lambda: evaluate_payment_models(prd_model, prd_results))
+                costs_summary = pay_results['summary']['costs']
 
-                    fig_units.add_trace(go.Box(
-                        y=n_units[0],
-                        fillcolor=f'rgba({colors[color_index][4:-1]},0.5)',
-                        line_color=colors[color_index],
-                        name=prd_model.name))
+                # risk metrics of the total contract costs over all runs
+                risks = risk.evaluate(upfront_payment + pay_results['total_costs'], classic[-1])
 
                 # loop through the payment models
                 for pay_id, pay_model in enumerate(st.session_state['payment_models']):
 
-                    # simulation name
+                    # simulation name and color
                     sim_name = f'''sim-{prd_id}-{pay_id}'''
+                    color = colors[color_index % len(colors)]
 
-                    # set payment upfront
-                    pay_model.payment_upfront = upfront_payment
-
-                    # compute monthly rates
-                    pay_model.number_of_units = n_units[0]
-                    # rates = pay_model.get_results()
-                    rates = pay_model.payment_per_month + n_units[0] * pay_model.payment_per_production_unit
-                    rates_mean = pay_model.payment_per_month + n_units_mean * pay_model.payment_per_production_unit
-                    rates_upper = pay_model.payment_per_month + n_units_upper * pay_model.payment_per_production_unit
-                    rates_lower = pay_model.payment_per_month + n_units_lower * pay_model.payment_per_production_unit
-
-                    # compute cumulative costs
-                    costs = [x + pay_model.payment_upfront for x in np.cumsum(rates_mean)]
-                    costs_upper = [x + pay_model.payment_upfront for x in np.cumsum(rates_upper)]
-                    costs_lower = [x + pay_model.payment_upfront for x in np.cumsum(rates_lower[::-1])][::-1]
+                    # cumulative costs (mean and P5/P95 band of the per-run cumulative costs)
+                    costs = upfront_payment + costs_summary['mean'][pay_id]
+                    costs_upper = upfront_payment + costs_summary['p95'][pay_id]
+                    costs_lower = upfront_payment + costs_summary['p5'][pay_id]
 
                     # add entry to the list
-                    cost_diff = costs[-1]-classic[-1]
-                    color = 'green' if cost_diff < 0 else 'red'
-                    cumsum_list += f'''\n| {sim_name} | {prd_model.name} | {pay_model.name} | {format_decimal(costs[-1], format='#,##0.00', locale='de_CH')} CHF | **<span style="color: {color};">{format_decimal(costs[-1]-classic[-1], format='#,##0.00', locale='de_CH')}</span> CHF** | '''
-
-                    # check if this is the "best" combination of models (best = lowest costs)
-                    if min_costs == -1 or costs[-1] < min_costs:
-                        min_costs = costs[-1]
-                        if 'best' not in st.session_state:
-                            st.session_state['best'] = dict()
-                        st.session_state['best']['prd'] = prd_model
-                        st.session_state['best']['pay'] = pay_model
-
-                    fig_cumsum.add_trace(go.Scatter(
-                        x=months + months_rev,
-                        y=np.hstack([costs_upper, costs_lower]),
-                        fill='toself',
-                        fillcolor=f'rgba({colors[color_index][4:-1]},0.2)',
-                        line_color=f'rgba({colors[color_index][4:-1]},0)',
-                        showlegend=True,
-                        name=sim_name + _('_confidence')
-                    ))
-
-                    fig_cumsum.add_trace(go.Scatter(
-                        x=months,
-                        y=costs,
-                        line_color=colors[color_index],
-                        name=sim_name + _('_mean'),
-                        showlegend=True))
-
-                    if plot_type == 'line chart':
-
-                        fig_rate.add_trace(go.Scatter(
-                            x=months + months_rev,
-                            y=np.hstack([rates_upper, rates_lower]),
-                            fill='toself',
-                            fillcolor=f'rgba({colors[color_index][4:-1]},0.2)',
-                            line_color=f'rgba({colors[color_index][4:-1]},0)',
-                            showlegend=False,
-                            name=sim_name))
-
-                        fig_rate.add_trace(go.Scatter(
-                            x=months,
-                            y=rates,
-                            line=dict(color=f'rgba({colors[color_index][4:-1]},0.5)', width=1, dash='dash'),
-                            line_shape='spline',
-                            showlegend=False,
-                            name=prd_model.name))
-
-                        fig_rate.add_trace(go.Scatter(
-                            x=months,
-                            y=rates_mean,
-                            line_color=colors[color_index],
-                            showlegend=True,
-                            name=sim_name))
-
-                    else:
-
-                        fig_rate.add_trace(go.Box(
-                            y=rates,
-                            fillcolor=f'rgba({colors[color_index][4:-1]},0.5)',
-                            line_color=colors[color_index],
-                            name=sim_name))
+                    final_costs = sweep['final_costs'][step, prd_id, pay_id]
+                    cost_diff = final_costs-classic[-1]
+                    diff_color = 'green' if cost_diff < 0 else 'red'
+                    break_even = sweep['break_even'][step, prd_id, pay_id] or '-'
+                    cumsum_list += f'''\n| {sim_name} | {prd_model.name} | {pay_model.name} | {format_decimal(final_costs, format='#,##0.00', locale='de_CH')} CHF | **<span style="color: {diff_color};">{format_decimal(cost_diff, format='#,##0.00', locale='de_CH')}</span> CHF** | {break_even} | '''
+
+                    risk_list += f'''\n| {sim_name} | {format_decimal(risks['mean'][pay_id], format='#,##0.00', locale='de_CH')} CHF | {format_decimal(risks['var'][pay_id], format='#,##0.00', locale='de_CH')} CHF | {format_decimal(risks['cvar'][pay_id], format='#,##0.00', locale='de_CH')} CHF | {risks['p_exceed'][pay_id]:.1%} | {format_decimal(risks['expected_shortfall'][pay_id], format='#,##0.00', locale='de_CH')} CHF | '''
+
+                    fig_cumsum.add_trace(charts.band(months, costs_upper, costs_lower, color, webgl,
+                                                     showlegend=True,
+                                                     name=sim_name + _('_confidence')))
+
+                    fig_cumsum.add_trace(charts.line(months, costs, webgl,
+                                                     line_color=color,
+                                                     name=sim_name + _('_mean'),
+                                                     showlegend=True))
+
+                    # monthly rates do not depend on the upfront payment
+                    for trace in get_cached(('rates', prd_id, pay_id), (pay_results,),
+                                            (plot_type, webgl, color, sim_name, prd_model.name, n_months),
+                                            lambda: build_rate_traces(pay_results, pay_id, plot_type, webgl, color,
+                                                                      sim_name, prd_model.name, months)):
+                        fig_rate.add_trace(trace)
 
                     # update color
                     color_index += color_delta
@@ -496,6 +534,7 @@ def show():
             )
             cumsum1.plotly_chart(fig_cumsum, use_container_width=True)
             cumsum2.markdown(cumsum_list, unsafe_allow_html=True)
+            risk_table.markdown(risk_list)
 
             if plot_type == 'line chart':
 
@@ -540,43 +579,119 @@ def show():
             st.plotly_chart(fig_rate, use_container_width=True)
             st.plotly_chart(fig_units, use_container_width=True)
 
+            # size of the chart data sent to the browser
+            payload = charts.payload_size(fig_cumsum, fig_rate, fig_units)
+            st.caption(f'''{_('Chart data')}: {format_decimal(payload / 1024, format='#,##0', locale='de_CH')} kB''')
+
             # create report
             # create_report(fig_cumsum)
 
 
-@st.cache
-def get_compatible_models(models) -> pd.DataFrame:
+def get_cached(slot, sources, key, build):
 
-    machine_id = st.session_state['machine']['Id']
+    # per-session cache of scenario results and trace payloads: an entry is rebuilt only if one of its source
+    # objects (compared by identity) or its key changed
+    if 'scenario_cache' not in st.session_state:
+        st.session_state['scenario_cache'] = dict()
+    cache = st.session_state['scenario_cache']
+    entry = cache.get(slot)
+    if entry is None or entry[1] != key or len(entry[0]) != len(sources) or \
+            any(old is not new for old, new in zip(entry[0], sources)):
+        entry = (sources, key, build())
+        cache[slot] = entry
+    return entry[2]
+
+
+def evaluate_payment_models(prd_model, prd_results):
+
+    # rates and cumulative costs (without upfront payment) of all payment models for the runs of a production model
+    production_time = 0
+    if any(pm.payment_per_production_time for pm in st.session_state['payment_models']):
+        production_time = prd_results['OEE'] * (prd_model.hours_per_day * prd_model.days_per_month)
+    pay_results = payment_model.evaluate(st.session_state['payment_models'], prd_results['number_of_units'],
+                                         production_time, include_upfront=False)
 
-    rows_to_drop = []
-    for index, row in models.iterrows():
-        if isinstance(row['Compatible Machines'], str):
-            if not any(machine_id in m for m in row['Compatible Machines'].split(',')):
-                rows_to_drop.append(index)
-    compatible = models.drop(rows_to_drop)
+    # keep only what is shown: the first run, the summary statistics and the total costs of every run
+    return {'rates': pay_results['rates'][:, 0], 'summary': pay_results['summary'],
+            'total_costs': pay_results['costs'][:, :, -1]}
 
-    # return compatible models
-    return compatible
 
+def build_unit_traces(prd_results, plot_type, webgl, color, name, months):
 
-@st.cache
-def compute_classic_payment(n_months, upfront, rates, amortization, maintenance, costs):
+    n_units = prd_results['number_of_units']
+    n_units_mean = prd_results['summary']['number_of_units']['mean']
+    n_units_std = prd_results['summary']['number_of_units']['std']
+    n_units_upper = n_units_mean+(1.96*n_units_std)
+    n_units_lower = n_units_mean-(1.96*n_units_std)
 
-    monthly_rates = []
-    costs -= upfront
-    for i in range(n_months):
-        rate = 0
-        if costs > 0:
-            rate = costs*rates + amortization
-            if i >= 24:
-                rate += maintenance
-            costs -= amortization
-        monthly_rates.append(rate)
-        print(monthly_rates)
+    if plot_type == 'line chart':
+        return [charts.band(months, n_units_upper, n_units_lower, color, webgl,
+                            showlegend=False,
+                            name=name),
+                charts.line(months, n_units[0], webgl, spline=True,
+                            line=dict(color=f'rgba({color[4:-1]},0.5)', width=1, dash='dash'),
+                            showlegend=False,
+                            name=name),
+                charts.line(months, n_units_mean, webgl,
+                            line_color=color,
+                            showlegend=True,
+                            name=name)]
+
+    return [charts.box(n_units[0], color, name)]
+
+
+def build_rate_traces(pay_results, pay_id, plot_type, webgl, color, sim_name, prd_name, months):
+
+    # monthly rates (first run, mean and P5/P95 band)
+    rates_summary = pay_results['summary']['rates']
+    rates = pay_results['rates'][pay_id]
+    rates_mean = rates_summary['mean'][pay_id]
+    rates_upper = rates_summary['p95'][pay_id]
+    rates_lower = rates_summary['p5'][pay_id]
+
+    if plot_type == 'line chart':
+        return [charts.band(months, rates_upper, rates_lower, color, webgl,
+                            showlegend=False,
+                            name=sim_name),
+                charts.line(months, rates, webgl, spline=True,
+                            line=dict(color=f'rgba({color[4:-1]},0.5)', width=1, dash='dash'),
+                            showlegend=False,
+                            name=prd_name),
+                charts.line(months, rates_mean, webgl,
+                            line_color=color,
+                            showlegend=True,
+                            name=sim_name)]
+
+    return [charts.box(rates, color, sim_name)]
+
+
+def get_upfront_default(machine_costs):
+
+    return int(machine_costs/3)
+
+
+def get_upfront_values(machine_costs):
+
+    # values the upfront payment slider can return: its default, the steps and the maximum
+    values = set(range(0, int(machine_costs) + 1, UPFRONT_STEP))
+    values.update([get_upfront_default(machine_costs), int(machine_costs)])
+    return tuple(sorted(values))
+
+
+def compute_upfront_sweep(grid, n_months, machine_costs, upfronts, interest_rate, amortization, maintenance):
+
+    # all values of the upfront payment slider, evaluated in one batch
+    classic = classic_financing.compute_costs(n_months, machine_costs, upfronts, interest_rate, amortization,
+                                              maintenance)
+    return scenarios.upfront_sweep(grid['costs'], upfronts, classic)
+
+
+def get_compatible_models() -> pd.DataFrame:
+
+    machine_id = st.session_state['machine']['Id']
 
-    # monthly_rates = [(costs-upfront)*rates]*n_months
-    return [x + upfront for x in np.cumsum(monthly_rates)]
+    # indexed lookup of the payment models compatible with the machine
+    return loader.get_compatible(setup.INPUT_FILE, setup.PAYMENT_SHEET, 'Compatible Machines', machine_id)
 
 
 def create_report(fig):
@@ -584,11 +699,12 @@ def create_report(fig):
     # set translation function
     _ = localization.get_translation('settings', st.session_state['language'])
 
-    # clear folder
+    # clear folder (sub-folders such as the simulation cache are kept)
     folder = 'tmp'
     for filename in os.listdir(folder):
         file_path = os.path.join(folder, filename)
-        os.unlink(file_path)
+        if os.path.isfile(file_path):
+            os.unlink(file_path)
 
     # create fig image
     file_path = os.path.join(folder, 'fig1.png')
@@ -0,0 +1,45 @@
+# core modules
+import base64
+import mimetypes
+import os
+import threading
+
+# development mode: assets are reloaded when their files change, otherwise they are read once per process
+DEV_MODE = os.environ.get('ASSETS_DEV_MODE', '').lower() in ('1', 'true', 'yes')
+
+# loaded assets of this process: (file, mode) -> (modification time, content)
+_assets = {}
+_assets_lock = threading.Lock()
+
+
+def _load(file, mode):
+
+    cached = _assets.get((file, mode))
+    if cached is not None and not DEV_MODE:
+        return cached[1]
+
+    with _assets_lock:
+        mtime = os.path.getmtime(file)
+        cached = _assets.get((file, mode))
+        if cached is None or cached[0] != mtime:
+            with open(file, mode) as asset:
+                cached = (mtime, asset.read())
+            _assets[(file, mode)] = cached
+    return cached[1]
+
+
+def get_text(file):
+
+    return _load(file, 'r')
+
+
+def get_bytes(file):
+
+    return _load(file, 'rb')
+
+
+def get_data_uri(file):
+
+    # image embedded into markup, so the page does not depend on external image hosts
+    mimetype = mimetypes.guess_type(file)[0] or 'application/octet-stream'
+    return f'data:{mimetype};base64,{base64.b64encode(get_bytes(file)).decode("ascii")}'
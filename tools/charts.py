@@ -0,0 +1,74 @@
+import numpy as np
+import plotly.graph_objects as go
+
+# above this number of line traces per figure, the traces are rendered with WebGL
+WEBGL_THRESHOLD = 50
+
+# maximum number of points per line trace (longer series are thinned out)
+MAX_POINTS = 240
+
+
+def use_webgl(n_traces):
+
+    # svg rendering gets slow with many traces, WebGL keeps the browser responsive
+    return n_traces > WEBGL_THRESHOLD
+
+
+def downsample(x, *ys, max_points=MAX_POINTS):
+
+    # keep every n-th point and always the last one
+    x = np.asarray(x)
+    if len(x) <= max_points:
+        return (x,) + tuple(np.asarray(y) for y in ys)
+    index = np.unique(np.r_[np.arange(0, len(x), int(np.ceil(len(x) / max_points))), len(x) - 1])
+    return (x[index],) + tuple(np.asarray(y)[index] for y in ys)
+
+
+def line(x, y, webgl=False, spline=False, **kwargs):
+
+    # WebGL traces do not support spline interpolation
+    x, y = downsample(x, y)
+    if webgl:
+        return go.Scattergl(x=x, y=y, mode='lines', **kwargs)
+    if spline:
+        kwargs['line_shape'] = 'spline'
+    return go.Scatter(x=x, y=y, **kwargs)
+
+
+def band(x, upper, lower, color, webgl=False, **kwargs):
+
+    # filled area between the upper and the lower bound
+    x, upper, lower = downsample(x, upper, lower)
+    trace = go.Scattergl if webgl else go.Scatter
+    return trace(x=np.r_[x, x[::-1]],
+                 y=np.r_[upper, lower[::-1]],
+                 fill='toself',
+                 fillcolor=f'rgba({color[4:-1]},0.2)',
+                 line_color=f'rgba({color[4:-1]},0)',
+                 **kwargs)
+
+
+def box(values, color, name):
+
+    # quartiles and whiskers (1.5 IQR, limited to the data) are computed here, so only five numbers per box are
+    # sent to the browser instead of the raw values
+    values = np.asarray(values, dtype=np.float64).ravel()
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    lowerfence = values[values >= q1 - 1.5 * iqr].min()
+    upperfence = values[values <= q3 + 1.5 * iqr].max()
+    return go.Box(x=[name],
+                  q1=[q1],
+                  median=[median],
+                  q3=[q3],
+                  lowerfence=[lowerfence],
+                  upperfence=[upperfence],
+                  fillcolor=f'rgba({color[4:-1]},0.5)',
+                  line_color=color,
+                  name=name)
+
+
+def payload_size(*figures):
+
+    # size of the serialized figures in bytes, as sent to the browser
+    return sum(len(figure.to_json()) for figure in figures)
@@ -0,0 +1,42 @@
+# core modules
+import argparse
+import json
+import os
+
+# custom modules
+from tools import loader
+
+# input file and compiled sheets
+INPUT_FILE = 'database/datamodel.xlsx'
+SHEETS = ['Machines', 'Options', 'Production Models', 'Payment Models']
+
+
+def compile_datamodel(file=INPUT_FILE, sheets=SHEETS):
+
+    # convert the sheets of the workbook into feather files
+    datamodel = loader.read_workbook(file)
+    folder = loader.get_compiled_folder(file)
+    os.makedirs(folder, exist_ok=True)
+    manifest = {'source': os.path.basename(file), 'sha256': loader.get_file_hash(file), 'sheets': {}}
+    for sheet in sheets:
+        name = sheet.lower().replace(' ', '_') + '.feather'
+        datamodel[sheet].to_feather(os.path.join(folder, name))
+        manifest['sheets'][sheet] = name
+
+    # the manifest is written last, so the loader never picks up a partially compiled datamodel
+    with open(os.path.join(folder, loader.MANIFEST_FILE), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the Excel datamodel into feather files.')
+    parser.add_argument('file', nargs='?', default=INPUT_FILE, help='datamodel workbook')
+    parser.add_argument('--sheets', nargs='+', default=SHEETS, help='sheets to compile')
+    args = parser.parse_args()
+    manifest = compile_datamodel(args.file, args.sheets)
+    print(f'''compiled {len(manifest['sheets'])} sheets of {args.file}''')
+
+
+if __name__ == '__main__':
+    main()
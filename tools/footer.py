@@ -4,6 +4,11 @@ from htbuilder.units import percent, px
 from htbuilder.funcs import rgba, rgb
 from os import getcwd
 
+from tools import assets
+
+# rendered footer markup (style and footer), built once per process
+_markup = None
+
 
 def image(src_as_string, **style):
     return img(src=src_as_string, style=styles(**style))
@@ -52,8 +57,6 @@ def layout(*args):
         body
     )
 
-    st.markdown(style, unsafe_allow_html=True)
-
     for arg in args:
         if isinstance(arg, str):
             body(arg)
@@ -61,21 +64,30 @@ def layout(*args):
         elif isinstance(arg, HtmlElement):
             body(arg)
 
-    st.markdown(str(foot), unsafe_allow_html=True)
+    return style, str(foot)
+
+
+def get_markup():
+    global _markup
+    if _markup is None:
+        myargs = [
+            "Made by",
+            br(),
+            image(assets.get_data_uri('resources/images/logo_zhaw.png'),
+                  width=px(20), height=px(20)),
+            " ZHAW and  ",
+            image(assets.get_data_uri('resources/images/logo_hsg.png'),
+                  width=px(20), height=px(20)),
+            " Universität St.Gallen",
+        ]
+        _markup = layout(*myargs)
+    return _markup
 
 
 def footer():
-    myargs = [
-        "Made by",
-        br(),
-        image('https://cdn.theorg.com/dfe2e7c5-5e4e-469f-8dc4-1c080bd67630_thumb.jpg',
-              width=px(20), height=px(20)),
-        " ZHAW and  ",
-        image('https://irphsg.ch/wp-content/uploads/2018/05/favicon-hsg.png',
-              width=px(20), height=px(20)),
-        " Universität St.Gallen",
-    ]
-    layout(*myargs)
+    style, foot = get_markup()
+    st.markdown(style, unsafe_allow_html=True)
+    st.markdown(foot, unsafe_allow_html=True)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,121 @@
+# core modules
+import hashlib
+import json
+import os
+import threading
+
 # 3rd party modules
 import pandas as pd
 
+# custom modules
+from tools import assets
+
+# compiled datamodel (see tools/compile_datamodel.py)
+COMPILED_FOLDER = 'compiled'
+MANIFEST_FILE = 'manifest.json'
+
+# parsed workbooks of this process: (file, compiled) -> (modification time, {sheet name: DataFrame}, indices)
+_datamodels = {}
+_datamodels_lock = threading.Lock()
+
 
 def get_css(file):
 
-    with open(file) as css:
-        return css.read()
+    return assets.get_text(file)
+
+
+def get_file_hash(file):
+
+    with open(file, 'rb') as source:
+        return hashlib.sha256(source.read()).hexdigest()
+
 
+def get_compiled_folder(file):
 
-def get_data(file, sheet):
+    return os.path.join(os.path.dirname(file), COMPILED_FOLDER)
+
+
+def read_compiled(file):
+
+    # returns the compiled sheets of the workbook, or None if they are missing or stale
+    folder = get_compiled_folder(file)
+    try:
+        with open(os.path.join(folder, MANIFEST_FILE)) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest['sha256'] != get_file_hash(file):
+            return None
+        return {sheet: pd.read_feather(os.path.join(folder, name)) for sheet, name in manifest['sheets'].items()}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def read_workbook(file):
 
     with pd.ExcelFile(file) as excel:
-        return pd.read_excel(excel, sheet_name=sheet, skiprows=3)
+        return pd.read_excel(excel, sheet_name=None, skiprows=3)
+
+
+def _load_datamodel(file, compiled):
+
+    # parse all sheets in a single pass, once per process and again only when the file changed
+    mtime = os.path.getmtime(file)
+    with _datamodels_lock:
+        cached = _datamodels.get((file, compiled))
+        if cached is None or cached[0] != mtime:
+            # prefer the compiled datamodel, fall back to the workbook if it is missing or stale
+            sheets = read_compiled(file) if compiled else None
+            if sheets is None:
+                sheets = read_workbook(file)
+            # column names are referenced without surrounding whitespace (e.g. 'Id ' in the options sheet)
+            for data in sheets.values():
+                data.columns = [str(column).strip() for column in data.columns]
+            cached = (mtime, sheets, {})
+            _datamodels[(file, compiled)] = cached
+    return cached
+
+
+def get_datamodel(file, compiled=True):
+
+    return _load_datamodel(file, compiled)[1]
+
+
+def get_data(file, sheet, compiled=True):
+
+    # sheets that were not compiled are read from the workbook
+    datamodel = get_datamodel(file, compiled)
+    if sheet not in datamodel:
+        datamodel = get_datamodel(file, compiled=False)
+
+    # every session gets its own copy, so changes in one session never reach the cached datamodel
+    # (the sheets are small, the copy is made once per session)
+    return datamodel[sheet].copy(deep=True)
+
+
+def build_compatibility_index(data, column):
+
+    # maps every machine id to the positions of its compatible rows; rows without a list of machines are
+    # compatible with all machines
+    index = {None: []}
+    for position, machines in enumerate(data[column]):
+        if isinstance(machines, str):
+            for machine_id in {m.strip() for m in machines.split(',')} - {''}:
+                index.setdefault(machine_id, []).append(position)
+        else:
+            index[None].append(position)
+    return index
+
+
+def get_compatible(file, sheet, column, machine_id, compiled=True):
+
+    # the index is built once per loaded datamodel
+    mtime, datamodel, indices = _load_datamodel(file, compiled)
+    if sheet not in datamodel:
+        mtime, datamodel, indices = _load_datamodel(file, compiled=False)
+    with _datamodels_lock:
+        if (sheet, column) not in indices:
+            indices[(sheet, column)] = build_compatibility_index(datamodel[sheet], column)
+        index = indices[(sheet, column)]
+
+    # compatible rows in their original order
+    positions = sorted(index[None] + index.get(machine_id, []))
+    return datamodel[sheet].take(positions)